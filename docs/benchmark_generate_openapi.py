@@ -0,0 +1,276 @@
+"""Benchmark suite for generate_openapi() on synthetic registries.
+
+Generates subnets/<id>/api.yml trees at several scales (nested requestSchemas, queryParams,
+pathParams, multipart endpoints and large examples) and measures every build phase for wall
+time, peak traced memory (tracemalloc) and output size:
+
+    python benchmark_generate_openapi.py                         # scales 10, 100, 1000
+    python benchmark_generate_openapi.py --scales 10,100 --update-baseline
+    python benchmark_generate_openapi.py --threshold 0.25        # exit 1 on a >25% regression
+
+Results are compared with the stored baseline (benchmark_baseline.json by default); any time,
+memory or output size above baseline * (1 + threshold) is reported as a regression.
+"""
+import os
+import sys
+import copy
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import logging
+import tracemalloc
+
+import yaml
+
+from generate_openapi import (
+    YamlSafeLoader, add_defaults_to_schema, build_subnets, discover_subnets, generate_openapi,
+    list_definition_files, write_spec
+)
+
+DEFAULT_SCALES = (10, 100, 1000)
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.2
+METRICS = ("time_s", "peak_kib", "output_bytes")
+
+
+def _nested_schema(rng, depth, width):
+    """An object schema nested depth levels deep, mixing scalars, arrays and sub-objects."""
+    properties = {}
+    for i in range(width):
+        kind = rng.choice(("string", "integer", "number", "boolean", "array", "object") if depth else
+                          ("string", "integer", "number", "boolean"))
+        name = f"{kind}Field{i}"
+        if kind == "array":
+            properties[name] = {"type": "array", "description": f"List {i}",
+                                "items": _nested_schema(rng, depth - 1, max(width // 2, 1))}
+        elif kind == "object":
+            properties[name] = _nested_schema(rng, depth - 1, max(width // 2, 1))
+        else:
+            properties[name] = {"type": kind, "description": f"Field {i} of type {kind}"}
+            if kind in ("integer", "number") and rng.random() < 0.3:
+                properties[name]["exclusiveMinimum"] = 0
+    return {"type": "object", "description": f"Object at depth {depth}", "properties": properties,
+            "required": sorted(properties)[:1]}
+
+
+def _large_example(rng, frames):
+    return {
+        "isAI": False,
+        "confidence": rng.random(),
+        "predictions": [rng.random() for _ in range(frames)],
+        "frameResults": [{"timestamp": i / 24, "isAI": rng.random() < 0.5, "confidence": rng.random()}
+                         for i in range(frames)],
+    }
+
+
+def generate_synthetic_registry(root, subnets, endpoints=8, depth=2, width=5, frames=144, seed=0):
+    """Writes a synthetic registry of subnets x endpoints under root. Endpoints cycle through
+       JSON POST with a nested schema, GET with queryParams, GET with pathParams and multipart
+       uploads; multipart endpoints get a large detect-video style response example."""
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    for subnet in range(1, subnets + 1):
+        subnet_dir = os.path.join(root, str(subnet))
+        endpoint_defs = []
+        for i in range(endpoints):
+            kind = ("json", "query", "path", "multipart")[i % 4]
+            endpoint = {
+                "path": f"/{kind}-endpoint-{i}",
+                "externalPath": f"/v1/{kind}-endpoint-{i}",
+                "method": "POST" if kind in ("json", "multipart") else "GET",
+                "summary": f"Synthetic {kind} endpoint {i}",
+                "description": f"Synthetic {kind} endpoint {i} of subnet {subnet}.",
+                "auth": {"type": "header", "key": "Authorization", "value": "{{api-key}}"},
+                "headers": {"Content-Type": "multipart/form-data" if kind == "multipart" else "application/json"},
+                "responseSchema": _nested_schema(rng, depth, width),
+            }
+            example_request = None
+            if kind == "json":
+                endpoint["requestSchema"] = _nested_schema(rng, depth, width)
+                example_request = {"stringField0": "value"}
+            elif kind == "query":
+                endpoint["queryParams"] = [
+                    {"name": "mode", "type": "string", "enum": ["fast", "accurate"]},
+                    {"name": "limit", "type": "integer", "minimum": 1, "maximum": 100, "default": 10},
+                    {"name": "ids", "type": "array", "items": {"type": "string"}},
+                ]
+                example_request = {"mode": "fast", "limit": 5}
+            elif kind == "path":
+                endpoint["externalPath"] += "/{itemId}"
+                endpoint["pathParams"] = [{"name": "itemId", "type": "string", "description": "Item ID"}]
+            else:
+                schema = _nested_schema(rng, 0, width)
+                schema["properties"]["video"] = {"type": "file", "description": "Video file"}
+                schema["required"] = ["video"]
+                endpoint["requestSchema"] = schema
+                example_request = {"formData": {"video": "<binary file>"}}
+            endpoint_defs.append(endpoint)
+
+            example_dir = os.path.join(subnet_dir, "examples", endpoint["path"].strip("/"))
+            os.makedirs(example_dir, exist_ok=True)
+            if example_request is not None:
+                with open(os.path.join(example_dir, "request.json"), "w") as f:
+                    json.dump(example_request, f)
+            with open(os.path.join(example_dir, "response.json"), "w") as f:
+                json.dump(_large_example(rng, frames if kind == "multipart" else 3), f)
+
+        data = {"baseUrl": f"https://subnet-{subnet}.example.com", "name": f"Synthetic (Subnet {subnet})",
+                "endpoints": endpoint_defs}
+        with open(os.path.join(subnet_dir, "api.yml"), "w") as f:
+            yaml.safe_dump(data, f, sort_keys=False)
+
+
+def _load_all(api_definitions_path):
+    loaded = []
+    for subnet_id in discover_subnets(api_definitions_path):
+        subnet_dir = os.path.join(api_definitions_path, subnet_id)
+        for file in list_definition_files(subnet_dir):
+            with open(os.path.join(subnet_dir, file), "r") as f:
+                loaded.append(yaml.load(f, Loader=YamlSafeLoader))
+    return loaded
+
+
+def _normalize_all(loaded):
+    for data in loaded:
+        for endpoint in data.get("endpoints", []):
+            for key in ("requestSchema", "responseSchema"):
+                if endpoint.get(key):
+                    add_defaults_to_schema(endpoint[key])
+
+
+def _measure(fn, repeat):
+    """Returns (best wall time, peak traced KiB, result). Memory is traced in a separate run so
+       tracemalloc overhead does not skew the timings."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak / 1024, result
+
+
+def run_scale(workdir, subnets, endpoints, frames, repeat):
+    """Benchmarks every phase on a synthetic registry of the given size."""
+    api_definitions_path = os.path.join(workdir, f"subnets-{subnets}")
+    generate_synthetic_registry(api_definitions_path, subnets, endpoints, frames=frames)
+    output_file = os.path.join(workdir, f"openapi-{subnets}.json")
+    cache_dir = os.path.join(workdir, f"cache-{subnets}")
+    loaded = _load_all(api_definitions_path)
+    # add_defaults_to_schema() edits schemas in place: copy them up front, one per run (the timed
+    # runs plus the tracemalloc run), so the copying is neither timed nor traced
+    normalization_inputs = iter([copy.deepcopy(loaded) for _ in range(repeat + 1)])
+    spec = generate_openapi(api_definitions_path, output_file)
+    generate_openapi(api_definitions_path, output_file, cache_dir=cache_dir)
+
+    phases = {
+        "discovery": lambda: discover_subnets(api_definitions_path),
+        "yaml_parse": lambda: _load_all(api_definitions_path),
+        "schema_normalization": lambda: _normalize_all(next(normalization_inputs)),
+        "subnet_build": lambda: build_subnets(api_definitions_path, discover_subnets(api_definitions_path)),
+        "generate_openapi": lambda: generate_openapi(api_definitions_path, output_file),
+        "generate_openapi_cached": lambda: generate_openapi(api_definitions_path, output_file, cache_dir=cache_dir),
+        "serialization": lambda: write_spec(spec, output_file),
+    }
+
+    results = {}
+    for phase, fn in phases.items():
+        elapsed, peak_kib, _ = _measure(fn, repeat)
+        results[phase] = {"time_s": round(elapsed, 6), "peak_kib": round(peak_kib, 1)}
+    results["serialization"]["output_bytes"] = os.path.getsize(output_file)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns a list of regression messages of results against baseline."""
+    regressions = []
+    for scale, phases in results.items():
+        for phase, metrics in phases.items():
+            reference = baseline.get(scale, {}).get(phase, {})
+            for metric in METRICS:
+                if metric in metrics and reference.get(metric):
+                    ratio = metrics[metric] / reference[metric]
+                    if ratio > 1 + threshold:
+                        regressions.append(f"{scale} subnets / {phase} / {metric}: {metrics[metric]} vs "
+                                           f"baseline {reference[metric]} (+{ratio - 1:.0%})")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'subnets':>8} {'phase':<26} {'time ms':>10} {'peak KiB':>12} {'output bytes':>14}")
+    for scale, phases in results.items():
+        for phase, metrics in phases.items():
+            output = metrics.get("output_bytes", "")
+            print(f"{scale:>8} {phase:<26} {metrics['time_s'] * 1000:>10.1f} {metrics['peak_kib']:>12.1f} {output:>14}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark generate_openapi() on synthetic registries.")
+    parser.add_argument("--scales", default=",".join(str(scale) for scale in DEFAULT_SCALES),
+                        help="Comma separated numbers of subnets (default: 10,100,1000)")
+    parser.add_argument("--endpoints", type=int, default=8, help="Endpoints per subnet (default: 8)")
+    parser.add_argument("--frames", type=int, default=144,
+                        help="Array length of the large response examples (default: 144)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per phase, the best is kept")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help=f"Baseline results file (default: {DEFAULT_BASELINE})")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed relative regression before failing (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic registries (printed path)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="openapi-bench-")
+    results = {}
+    try:
+        for scale in (int(scale) for scale in args.scales.split(",")):
+            # The generator logs every rebuilt subnet, keep the benchmark output readable
+            logging.getLogger("generate_openapi").setLevel(logging.ERROR)
+            results[str(scale)] = run_scale(workdir, scale, args.endpoints, args.frames, args.repeat)
+            print(f"Benchmarked {scale} subnets")
+    finally:
+        if args.keep:
+            print(f"Synthetic registries kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"Performance regressions over {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions over {args.threshold:.0%} against {args.baseline}")
+    else:
+        print(f"No baseline at {args.baseline}, run with --update-baseline to create one")
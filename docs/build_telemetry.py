@@ -0,0 +1,194 @@
+"""Structured logging and per-stage profiling for the spec generator.
+
+Profiling is off by default and costs one function call per stage when disabled. When enabled
+with enable_profiling(), every stage() records its wall time, its peak memory above what was in
+use when it started and its net memory change (tracemalloc) as a Chrome trace event ("X" phase),
+so a trace written with write_trace() opens directly in Perfetto (https://ui.perfetto.dev),
+chrome://tracing or speedscope, which render it as a flame chart / flamegraph.
+"""
+import os
+import json
+import time
+import logging
+import contextlib
+import contextvars
+import tracemalloc
+
+logger = logging.getLogger("generate_openapi")
+
+# Subnet currently being built, attached to every log record emitted meanwhile
+current_subnet = contextvars.ContextVar("current_subnet", default=None)
+
+_profiler = None
+
+# Attributes every LogRecord has; anything else was passed through extra= and is structured data
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class SubnetContextFilter(logging.Filter):
+    """Adds the subnet being built (if any) to each record as record.subnet_id."""
+
+    def filter(self, record):
+        if getattr(record, "subnet_id", None) is None:
+            record.subnet_id = current_subnet.get()
+        return True
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including fields passed with extra=."""
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextLogFormatter(logging.Formatter):
+    """Plain messages as the generator used to print them: warnings get a "Warning: " prefix,
+       error messages say so themselves."""
+
+    def format(self, record):
+        message = record.getMessage()
+        if record.levelno == logging.WARNING:
+            message = f"Warning: {message}"
+        if record.exc_info:
+            message = f"{message}\n{self.formatException(record.exc_info)}"
+        return message
+
+
+def configure_logging(level="INFO", log_format="text"):
+    """Sends the generator's log records to stderr as text or JSON lines."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonLogFormatter() if log_format == "json" else TextLogFormatter())
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+
+logger.addFilter(SubnetContextFilter())
+
+
+class BuildProfiler:
+    """Collects stage timings and allocations as Chrome trace events."""
+
+    def __init__(self, trace_allocations=True):
+        self.trace_allocations = trace_allocations
+        self.events = []
+        # [memory at start, peak so far] of every open stage, innermost last
+        self._open = []
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _fold_peak(self):
+        """Records the traced peak in every open stage and returns the current traced memory."""
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self._open:
+            frame[1] = max(frame[1], peak)
+        return current
+
+    @contextlib.contextmanager
+    def stage(self, name, subnet_id=None):
+        if self.trace_allocations:
+            # The peak is reset for this stage; the enclosing stages keep theirs in self._open
+            current = self._fold_peak()
+            tracemalloc.reset_peak()
+            frame = [current, current]
+            self._open.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            args = {}
+            if subnet_id is not None:
+                args["subnet_id"] = subnet_id
+            if self.trace_allocations:
+                current = self._fold_peak()
+                self._open.remove(frame)
+                args["peak_bytes"] = frame[1] - frame[0]
+                args["net_bytes"] = current - frame[0]
+            self.events.append({
+                "name": name,
+                "cat": "subnet" if subnet_id is not None else "build",
+                "ph": "X",
+                "ts": round(start * 1e6, 3),
+                "dur": round((end - start) * 1e6, 3),
+                "pid": os.getpid(),
+                "tid": os.getpid(),
+                "args": args,
+            })
+
+    def close(self):
+        if self.trace_allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def enable_profiling(trace_allocations=True):
+    """Starts recording stages in this process and returns the profiler."""
+    global _profiler
+    _profiler = BuildProfiler(trace_allocations)
+    return _profiler
+
+
+def disable_profiling():
+    """Stops recording and returns the events recorded so far."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return []
+    profiler.close()
+    return profiler.events
+
+
+def profiling_enabled():
+    return _profiler is not None
+
+
+def record_events(events):
+    """Adds events recorded in another process (e.g. a build worker)."""
+    if _profiler is not None:
+        _profiler.events.extend(events)
+
+
+def stage(name, subnet_id=None):
+    """Context manager timing a build stage; a no-op unless profiling is enabled."""
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.stage(name, subnet_id)
+
+
+def summarize_events(events):
+    """Aggregates events into per-stage totals (milliseconds, highest peak bytes, summed net bytes)
+       and per-subnet build times."""
+    stages = {}
+    subnets = {}
+    for event in events:
+        entry = stages.setdefault(event["name"], {"calls": 0, "total_ms": 0.0, "peak_bytes": 0, "net_bytes": 0})
+        entry["calls"] += 1
+        entry["total_ms"] += event["dur"] / 1000
+        entry["peak_bytes"] = max(entry["peak_bytes"], event["args"].get("peak_bytes", 0))
+        entry["net_bytes"] += event["args"].get("net_bytes", 0)
+        if event["name"] == "subnet":
+            subnets[event["args"]["subnet_id"]] = round(event["dur"] / 1000, 3)
+    for entry in stages.values():
+        entry["total_ms"] = round(entry["total_ms"], 3)
+    return {"stages": stages, "subnets": subnets}
+
+
+def write_trace(events, trace_file):
+    """Writes events as a Chrome trace (JSON object format) with a summary section."""
+    origin = min((event["ts"] for event in events), default=0)
+    trace_events = [dict(event, ts=round(event["ts"] - origin, 3)) for event in events]
+    trace_events.sort(key=lambda event: (event["pid"], event["ts"], -event["dur"]))
+    with open(trace_file, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms",
+                   "otherData": summarize_events(events)}, f)
@@ -0,0 +1,362 @@
+"""Columnar binary encoding of array-heavy response fields.
+
+An endpoint can declare that numeric arrays in its response are also available as typed
+binary columns, which are a fraction of the size of their JSON and decode without parsing
+every number:
+
+    responseEncodings:
+      columnar:
+        mediaType: application/vnd.bitmind.columnar+json   # optional, this is the default
+        fields:
+          predictions: float32
+          frameResults:
+            timestamp: float32
+            isAI: bool
+            confidence: float32
+
+Clients opt in with `Accept: application/vnd.bitmind.columnar+json`. The response is the usual
+JSON object, except that every declared field present in it is replaced by
+
+    {"dtype": "<f4", "shape": [45], "data": "<base64>"}          # an array of numbers
+    {"shape": [144], "columns": {"timestamp": {...}, ...}}       # an array of objects, one column per key
+
+dtype is a NumPy type string (little-endian) and data the base64 of the raw values in
+row-major order, so numpy.frombuffer(base64.b64decode(data), dtype).reshape(shape) decodes a
+column. Floats are rounded to the declared precision; everything else round-trips exactly.
+
+This module is the reference encoder/decoder. It uses NumPy when it is installed and falls back
+to the array module otherwise; both produce the same bytes.
+
+    python columnar.py --check-examples      # round-trip every declared response example
+    python columnar.py --benchmark --frames 144
+"""
+import sys
+import json
+import math
+import time
+import array
+import base64
+import struct
+import argparse
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_MEDIA_TYPE = "application/vnd.bitmind.columnar+json"
+
+# Declared type -> NumPy type string of the column
+DTYPES = {"float32": "<f4", "float64": "<f8", "int32": "<i4", "uint8": "|u1", "bool": "|b1"}
+DTYPE_NAMES = {dtype: name for name, dtype in DTYPES.items()}
+
+# array module type codes and struct formats of the same types, for the fallback and for checks
+_TYPECODES = {"<f4": "f", "<f8": "d", "<i4": "i", "|u1": "B", "|b1": "B"}
+_STRUCT_FORMATS = {"<f4": "<f", "<f8": "<d", "<i4": "<i", "|u1": "<B", "|b1": "<?"}
+
+
+def _dtype(name, field):
+    if name not in DTYPES:
+        raise ValueError(f"Unknown dtype {name!r} for {field}, expected one of {', '.join(DTYPES)}")
+    return DTYPES[name]
+
+
+def parse_declaration(declaration):
+    """Validates an endpoint's responseEncodings.columnar entry. Returns (media type, fields), with
+       fields mapping each field to a NumPy type string, or to {column: type string} for arrays of
+       objects."""
+    fields = {}
+    for name, dtype in ((declaration or {}).get("fields") or {}).items():
+        if isinstance(dtype, dict):
+            fields[name] = {column: _dtype(column_dtype, f"{name}.{column}") for column, column_dtype in dtype.items()}
+        else:
+            fields[name] = _dtype(dtype, name)
+    if not fields:
+        raise ValueError("the columnar encoding declares no fields")
+    return declaration.get("mediaType", DEFAULT_MEDIA_TYPE), fields
+
+
+def _shape(values):
+    shape = []
+    while isinstance(values, list):
+        shape.append(len(values))
+        values = values[0] if values else None
+    return shape
+
+
+def _flatten(values, shape):
+    if len(shape) == 1:
+        return values
+    flat = []
+    for item in values:
+        if not isinstance(item, list) or len(item) != shape[1]:
+            raise ValueError("Cannot encode a ragged array")
+        flat += _flatten(item, shape[1:])
+    return flat
+
+
+def _reshape(values, shape):
+    if not shape:
+        return values[0]
+    for size in reversed(shape[1:]):
+        values = [values[i:i + size] for i in range(0, len(values), size)]
+    return values
+
+
+def _pack(values, dtype):
+    if any(isinstance(value, list) or value is None or isinstance(value, str) for value in values):
+        raise ValueError(f"Cannot encode non-numeric values as {DTYPE_NAMES[dtype]}")
+    if dtype == "|b1":
+        values = [1 if value else 0 for value in values]
+    elif dtype in ("<i4", "|u1"):
+        values = [int(value) for value in values]
+    try:
+        packed = array.array(_TYPECODES[dtype], values)
+    except OverflowError as e:
+        raise ValueError(f"Value out of range for {DTYPE_NAMES[dtype]}: {e}")
+    if sys.byteorder == "big" and packed.itemsize > 1:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def encode_array(values, dtype, use_numpy=True):
+    """Encodes a (nested, rectangular) list of numbers or booleans as a column of NumPy type string
+       dtype. use_numpy=False forces the array module fallback."""
+    if use_numpy and numpy is not None:
+        values = numpy.asarray(values)
+        if values.dtype.kind not in "biuf":
+            raise ValueError(f"Cannot encode {values.dtype} values as {DTYPE_NAMES[dtype]}")
+        shape, data = list(values.shape), values.astype(dtype).tobytes()
+    else:
+        shape = _shape(values)
+        data = _pack(_flatten(values, shape) if shape else [values], dtype)
+    return {"dtype": dtype, "shape": shape, "data": base64.b64encode(data).decode("ascii")}
+
+
+def decode_array(column, as_numpy=False):
+    """Decodes a column to nested lists, or to a NumPy array with as_numpy=True."""
+    dtype = column["dtype"]
+    if dtype not in _TYPECODES:
+        raise ValueError(f"Unsupported column dtype {dtype!r}")
+    data = base64.b64decode(column["data"])
+    if numpy is not None:
+        values = numpy.frombuffer(data, dtype=dtype).reshape(column["shape"])
+        return values if as_numpy else values.tolist()
+    if as_numpy:
+        raise RuntimeError("Decoding to arrays requires NumPy (pip install numpy)")
+
+    unpacked = array.array(_TYPECODES[dtype])
+    unpacked.frombytes(data)
+    if sys.byteorder == "big" and unpacked.itemsize > 1:
+        unpacked.byteswap()
+    if len(unpacked) != math.prod(column["shape"]):
+        raise ValueError(f"Column of shape {column['shape']} holds {len(unpacked)} values")
+    values = unpacked.tolist()
+    if dtype == "|b1":
+        values = [bool(value) for value in values]
+    return _reshape(values, column["shape"])
+
+
+def encode_response(response, fields, use_numpy=True):
+    """Returns a copy of response with the declared fields that are present encoded as columns."""
+    encoded = dict(response)
+    for name, dtype in fields.items():
+        values = response.get(name)
+        if values is None:
+            continue
+        if not isinstance(values, list):
+            raise ValueError(f"{name} is not an array")
+        if not isinstance(dtype, dict):
+            encoded[name] = encode_array(values, dtype, use_numpy)
+            continue
+        for row in values:
+            if not isinstance(row, dict) or row.keys() != dtype.keys():
+                raise ValueError(f"Every item of {name} needs exactly the columns {', '.join(dtype)}")
+        encoded[name] = {
+            "shape": [len(values)],
+            "columns": {column: encode_array([row[column] for row in values], column_dtype, use_numpy)
+                        for column, column_dtype in dtype.items()}
+        }
+    return encoded
+
+
+def decode_response(response, fields, as_numpy=False):
+    """Inverse of encode_response(). With as_numpy=True arrays are decoded to NumPy arrays and
+       arrays of objects to {column: array}, which is what most clients want to work with."""
+    decoded = dict(response)
+    for name, dtype in fields.items():
+        value = response.get(name)
+        if value is None:
+            continue
+        if not isinstance(dtype, dict):
+            decoded[name] = decode_array(value, as_numpy)
+            continue
+        columns = {column: decode_array(value["columns"][column], as_numpy) for column in dtype}
+        if as_numpy:
+            decoded[name] = columns
+        else:
+            decoded[name] = [dict(zip(columns, row)) for row in zip(*columns.values())]
+    return decoded
+
+
+def _column_schema(dtype):
+    return {
+        "type": "object",
+        "description": f"{DTYPE_NAMES[dtype]} values: base64 of the little-endian raw values in row-major order",
+        "required": ["dtype", "shape", "data"],
+        "properties": {
+            "dtype": {"type": "string", "enum": [dtype], "description": "NumPy type string of the values"},
+            "shape": {"type": "array", "items": {"type": "integer"}},
+            "data": {"type": "string", "format": "byte"}
+        }
+    }
+
+
+def columnar_schema(fields, media_type=DEFAULT_MEDIA_TYPE):
+    """OpenAPI schema of a response in the columnar encoding."""
+    properties = {}
+    for name, dtype in fields.items():
+        if not isinstance(dtype, dict):
+            properties[name] = _column_schema(dtype)
+            continue
+        properties[name] = {
+            "type": "object",
+            "description": f"The items of {name}, one column per property",
+            "required": ["shape", "columns"],
+            "properties": {
+                "shape": {"type": "array", "items": {"type": "integer"}},
+                "columns": {
+                    "type": "object",
+                    "required": list(dtype),
+                    "properties": {column: _column_schema(column_dtype) for column, column_dtype in dtype.items()}
+                }
+            }
+        }
+    return {
+        "type": "object",
+        "description": f"Sent instead of application/json when the request has `Accept: {media_type}`. "
+                       f"The response is the same JSON object, except that {', '.join(fields)} are "
+                       f"binary columns; decode a column with "
+                       f"numpy.frombuffer(base64.b64decode(data), dtype).reshape(shape).",
+        "properties": properties
+    }
+
+
+def _cast(value, dtype):
+    """value as it reads back from a column of dtype."""
+    if isinstance(value, list):
+        return [_cast(item, dtype) for item in value]
+    if dtype in ("<i4", "|u1"):
+        value = int(value)
+    return struct.unpack(_STRUCT_FORMATS[dtype], struct.pack(_STRUCT_FORMATS[dtype], value))[0]
+
+
+def roundtrip_errors(response, fields):
+    """Encodes and decodes response, returning a list of differences from the original (with
+       floats rounded to their column precision)."""
+    errors = []
+    encoded = encode_response(response, fields)
+    decoded = decode_response(json.loads(json.dumps(encoded)), fields)
+    for name, dtype in fields.items():
+        if name not in response:
+            continue
+        if isinstance(dtype, dict):
+            expected = [{column: _cast(row[column], column_dtype) for column, column_dtype in dtype.items()}
+                        for row in response[name]]
+        else:
+            expected = _cast(response[name], dtype)
+        if decoded[name] != expected:
+            errors.append(f"{name} does not round-trip")
+    if encode_response(decoded, fields) != encoded:
+        errors.append("re-encoding the decoded response gives different bytes")
+    if numpy is not None and encode_response(response, fields, use_numpy=False) != encoded:
+        # The array module fallback must produce exactly the reference bytes
+        errors.append("the pure-Python encoder disagrees with NumPy")
+    return errors
+
+
+def _json_bytes(value):
+    return len(json.dumps(value, separators=(",", ":")).encode())
+
+
+def check_examples(api_definitions_path):
+    """Round-trips the response example of every endpoint declaring a columnar encoding. Returns
+       the number of failing examples."""
+    from registry import iter_endpoints
+
+    failures = 0
+    for subnet_id, data, endpoint, example_index in iter_endpoints(api_definitions_path):
+        declaration = (endpoint.get("responseEncodings") or {}).get("columnar")
+        if declaration is None:
+            continue
+        name = f"{subnet_id}{endpoint['path']}"
+        example = None
+        try:
+            _, fields = parse_declaration(declaration)
+            example = example_index.load(subnet_id, endpoint["path"], "response")
+            errors = roundtrip_errors(example, fields) if example is not None else []
+        except ValueError as e:
+            errors = [str(e)]
+        for error in errors:
+            print(f"  {name}: {error}")
+        failures += bool(errors)
+        if example is not None and not errors:
+            print(f"  {name}: {_json_bytes(example)} bytes as JSON, "
+                  f"{_json_bytes(encode_response(example, fields))} bytes columnar")
+    return failures
+
+
+def run_benchmark(frames=144, iterations=2000):
+    """Compares size, encoding and decoding time of a detect-video style response as JSON and
+       columnar."""
+    fields = parse_declaration({"fields": {
+        "predictions": "float32",
+        "frameResults": {"timestamp": "float32", "isAI": "bool", "confidence": "float32"}
+    }})[1]
+    response = {
+        "isAI": False,
+        "confidence": 0.25,
+        "predictions": [(i * 7919 % 1000) / 1000 for i in range(frames)],
+        "frameResults": [{"timestamp": i / 24, "isAI": i % 3 == 0, "confidence": (i * 104729 % 1000) / 1000}
+                         for i in range(frames)],
+        "similarity": 0.1,
+        "fqdn": "sn34"
+    }
+    columnar = json.dumps(encode_response(response, fields))
+    plain = json.dumps(response)
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        return (time.perf_counter() - start) / iterations * 1e6
+
+    print(f"{frames} frames, {'NumPy' if numpy is not None else 'array module (NumPy not installed)'}")
+    print(f"  {'':<10} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+    print(f"  {'json':<10} {len(plain):>8} {timed(lambda: json.dumps(response)):>10.1f} "
+          f"{timed(lambda: json.loads(plain)):>10.1f}")
+    print(f"  {'columnar':<10} {len(columnar):>8} {timed(lambda: json.dumps(encode_response(response, fields))):>10.1f} "
+          f"{timed(lambda: decode_response(json.loads(columnar), fields, as_numpy=numpy is not None)):>10.1f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reference encoder/decoder of the columnar response encoding.")
+    parser.add_argument("--subnets", default="../subnets",
+                        help="Path to the subnets directory (default: ../subnets)")
+    parser.add_argument("--check-examples", action="store_true",
+                        help="Round-trip the response example of every endpoint declaring the encoding")
+    parser.add_argument("--benchmark", action="store_true", help="Compare JSON and columnar size and speed")
+    parser.add_argument("--frames", type=int, default=144, help="Frames in the benchmark response (default: 144)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.benchmark:
+        run_benchmark(args.frames)
+    if args.check_examples or not args.benchmark:
+        failures = check_examples(args.subnets)
+        if failures:
+            print(f"{failures} example(s) do not round-trip")
+            sys.exit(1)
+        print("All columnar examples round-trip")
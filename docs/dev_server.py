@@ -0,0 +1,435 @@
+"""Watch mode: rebuilds the spec as subnets/ changes and serves it from memory.
+
+    python generate_openapi.py --watch                 # http://127.0.0.1:8000/openapi.json
+    python generate_openapi.py --watch --port 8080 --poll-interval 0.5 --debounce 0.3
+
+On Linux the subnets directory is watched with inotify; elsewhere (or with --force-polling,
+e.g. for network file systems) it is polled for changed file modification times and sizes. A burst of
+changes (an editor saving several files, a git checkout) is collected until the tree has been
+quiet for the debounce interval, then only the subnets that changed are rebuilt and merged with
+the fragments already in memory.
+
+The spec is served with a strong ETag, answers If-None-Match with 304 Not Modified and is sent
+gzip-compressed to clients that accept it. Both encodings are prepared once per rebuild: each
+path entry is serialized and deflated on its own, so after an edit only the changed subnet's
+entries are encoded and compressed again. GET / serves a Swagger UI page for the live spec.
+"""
+import os
+import copy
+import time
+import zlib
+import errno
+import ctypes
+import ctypes.util
+import struct
+import asyncio
+import hashlib
+import mimetypes
+from collections import namedtuple
+
+from build_telemetry import logger
+from generate_openapi import (
+    BuildCache, DEFAULT_EXAMPLE_ARRAY_ITEMS, EXTERNAL_EXAMPLES_DIR, apply_example_budget, create_openapi_base,
+    deduplicate_schemas, discover_subnets, iter_spec_chunks, load_fragments, merge_fragments
+)
+from http_server import HTTPServer, respond
+
+DEFAULT_PORT = 8000
+DEFAULT_POLL_INTERVAL = 0.25
+DEFAULT_DEBOUNCE = 0.2
+SPEC_PATH = "/openapi.json"
+
+# gzip member header without file name, mtime 0, unknown OS; and an empty final deflate block
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+DEFLATE_END = b"\x03\x00"
+
+SWAGGER_UI_PAGE = b"""<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <title>Subnet IO Registry</title>
+  <link rel="stylesheet" href="https://unpkg.com/swagger-ui-dist@5/swagger-ui.css">
+</head>
+<body>
+  <div id="swagger-ui"></div>
+  <script src="https://unpkg.com/swagger-ui-dist@5/swagger-ui-bundle.js"></script>
+  <script>window.ui = SwaggerUIBundle({url: "/openapi.json", dom_id: "#swagger-ui"});</script>
+</body>
+</html>
+"""
+
+SpecDocument = namedtuple("SpecDocument", ["body", "gzip_body", "etag"])
+
+
+class RegistryWatcher:
+    """Detects added, removed and changed subnets by polling file modification times and sizes."""
+
+    def __init__(self, api_definitions_path):
+        self.api_definitions_path = api_definitions_path
+        self.snapshot = self.scan()
+
+    @staticmethod
+    def _scan_subnet(subnet_dir):
+        files = []
+        pending = [subnet_dir]
+        while pending:
+            try:
+                entries = list(os.scandir(pending.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        pending.append(entry.path)
+                    else:
+                        stat = entry.stat()
+                        files.append((entry.path, stat.st_mtime_ns, stat.st_size))
+                except FileNotFoundError:
+                    # Deleted between listing and stat, e.g. an editor's temporary file
+                    continue
+        return frozenset(files)
+
+    def scan(self):
+        return {
+            subnet_id: self._scan_subnet(os.path.join(self.api_definitions_path, subnet_id))
+            for subnet_id in discover_subnets(self.api_definitions_path)
+        }
+
+    def poll(self):
+        """Returns the IDs of the subnets added, removed or changed since the last poll."""
+        snapshot = self.scan()
+        changed = {
+            subnet_id for subnet_id in snapshot.keys() | self.snapshot.keys()
+            if snapshot.get(subnet_id) != self.snapshot.get(subnet_id)
+        }
+        self.snapshot = snapshot
+        return changed
+
+
+class InotifyWatcher:
+    """Detects added, removed and changed subnets from inotify events (Linux only).
+
+       Every directory of the tree is watched; poll() drains the pending events without blocking."""
+
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_Q_OVERFLOW = 0x4000
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, api_definitions_path):
+        self.api_definitions_path = os.path.abspath(api_definitions_path)
+        self.directories = {}
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        try:
+            self._watch_tree(self.api_definitions_path)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _watch_tree(self, directory):
+        pending = [directory]
+        while pending:
+            directory = pending.pop()
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOENT:
+                    continue
+                # ENOSPC: fs.inotify.max_user_watches is too low for the tree
+                raise OSError(error, f"Cannot watch {directory}: {os.strerror(error)}")
+            self.directories[wd] = directory
+            try:
+                pending.extend(entry.path for entry in os.scandir(directory) if entry.is_dir())
+            except FileNotFoundError:
+                continue
+
+    def _subnet_of(self, path):
+        return os.path.relpath(path, self.api_definitions_path).split(os.sep, 1)[0]
+
+    def poll(self):
+        """Returns the IDs of the subnets added, removed or changed since the last poll."""
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, name_length = self.EVENT.unpack_from(data, offset)
+                name = os.fsdecode(data[offset + self.EVENT.size:offset + self.EVENT.size + name_length].rstrip(b"\0"))
+                offset += self.EVENT.size + name_length
+                if mask & self.IN_Q_OVERFLOW:
+                    # Events were dropped, assume everything changed
+                    changed |= set(discover_subnets(self.api_definitions_path))
+                    continue
+                directory = self.directories.get(wd)
+                if directory is None:
+                    continue
+                if mask & self.IN_DELETE_SELF:
+                    del self.directories[wd]
+                path = os.path.join(directory, name) if name else directory
+                if path == self.api_definitions_path:
+                    continue
+                if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    try:
+                        self._watch_tree(path)
+                    except OSError as e:
+                        logger.warning(f"{e}; changes below it are not picked up, consider --force-polling")
+                changed.add(self._subnet_of(path))
+        return {subnet_id for subnet_id in changed if subnet_id.isdigit()}
+
+
+def create_watcher(api_definitions_path, force_polling=False):
+    """Returns an InotifyWatcher when the platform supports it, a polling RegistryWatcher otherwise."""
+    if not force_polling and hasattr(os, "O_CLOEXEC"):
+        try:
+            return InotifyWatcher(api_definitions_path)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable ({e}), polling {api_definitions_path} instead")
+    return RegistryWatcher(api_definitions_path)
+
+
+class SpecEncoder:
+    """Serializes specs with iter_spec_chunks() and gzips them incrementally.
+
+       Every chunk is deflated on its own and ends on a full flush, which resets the compressor,
+       so the compressed chunks can be concatenated into a single valid gzip member. Chunks that
+       did not change since the previous spec reuse their encoding; only the CRC-32 of the
+       document is computed again."""
+
+    def __init__(self, compact=False, level=6):
+        self.compact = compact
+        self.level = level
+        self._text_memo = {}
+        self._encoded = {}
+
+    def _encode_chunk(self, chunk):
+        data = chunk.encode("utf-8")
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        deflated = compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+        return data, deflated, hashlib.blake2b(data, digest_size=16).digest()
+
+    def encode(self, openapi):
+        encoded = {}
+        body = []
+        gzip_body = [GZIP_HEADER]
+        digests = []
+        crc = 0
+        for chunk in iter_spec_chunks(openapi, self.compact, self._text_memo):
+            entry = encoded.get(chunk) or self._encoded.get(chunk)
+            if entry is None:
+                entry = self._encode_chunk(chunk)
+            encoded[chunk] = entry
+            data, deflated, digest = entry
+            body.append(data)
+            gzip_body.append(deflated)
+            digests.append(digest)
+            crc = zlib.crc32(data, crc)
+
+        body = b"".join(body)
+        gzip_body.append(DEFLATE_END + struct.pack("<II", crc, len(body) & 0xFFFFFFFF))
+        # Forget path entries and chunks the new spec no longer has
+        self._encoded = encoded
+        paths = openapi.get("paths", {})
+        self._text_memo = {path: cached for path, cached in self._text_memo.items() if path in paths}
+        etag = hashlib.blake2b(b"".join(digests), digest_size=16).hexdigest()
+        return SpecDocument(body, b"".join(gzip_body), etag)
+
+
+class LiveSpec:
+    """The current spec, rebuilt subnet by subnet and kept serialized in memory."""
+
+    def __init__(self, api_definitions_path, output_dir=".", cache_dir=None, jobs=1, dedupe_schemas=False,
+                 example_budget=None, example_mode="summarize", example_array_items=DEFAULT_EXAMPLE_ARRAY_ITEMS,
+                 compact=False):
+        self.api_definitions_path = api_definitions_path
+        self.output_dir = output_dir
+        self.cache = BuildCache(cache_dir) if cache_dir else None
+        self.jobs = jobs
+        self.dedupe_schemas = dedupe_schemas
+        self.example_budget = example_budget
+        self.example_mode = example_mode
+        self.example_array_items = example_array_items
+        self.encoder = SpecEncoder(compact)
+        self.subnet_paths = {}
+        self.document = None
+
+    def _subnet_paths(self, subnet_id, fragment):
+        paths = merge_fragments({"paths": {}}, [subnet_id], {subnet_id: fragment})["paths"]
+        if self.example_budget is not None:
+            # The budget applies to each example on its own, so it can be applied per subnet
+            apply_example_budget({"paths": paths}, self.example_budget, self.example_mode,
+                                 self.example_array_items, self.output_dir)
+        return paths
+
+    def rebuild(self, subnet_ids=None):
+        """Rebuilds subnet_ids (every subnet when None), then re-renders the spec."""
+        start = time.perf_counter()
+        all_ids = discover_subnets(self.api_definitions_path)
+        stale_ids = all_ids if subnet_ids is None else [subnet_id for subnet_id in all_ids if subnet_id in subnet_ids]
+
+        fragments = load_fragments(self.api_definitions_path, stale_ids, self.cache, self.jobs)
+        subnet_paths = {subnet_id: self.subnet_paths[subnet_id] for subnet_id in all_ids
+                        if subnet_id in self.subnet_paths and subnet_id not in fragments}
+        for subnet_id, fragment in fragments.items():
+            subnet_paths[subnet_id] = self._subnet_paths(subnet_id, fragment)
+        if self.cache:
+            self.cache.prune(all_ids)
+
+        openapi = create_openapi_base()
+        for subnet_id in all_ids:
+            openapi["paths"].update(subnet_paths[subnet_id])
+        if self.dedupe_schemas:
+            # Deduplication rewrites schemas in place and spans every subnet, keep the fragments intact
+            openapi = copy.deepcopy(openapi)
+            deduplicate_schemas(openapi)
+
+        self.document = self.encoder.encode(openapi)
+        self.subnet_paths = subnet_paths
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        removed = sorted(set(subnet_ids or ()) - set(all_ids))
+        logger.info(f"Rebuilt {'all subnets' if subnet_ids is None else 'subnet ' + ', '.join(sorted(stale_ids) + removed)} "
+                    f"in {elapsed_ms:.1f} ms ({len(self.document.body)} bytes, "
+                    f"{len(self.document.gzip_body)} gzipped)",
+                    extra={"subnets": stale_ids, "removed": removed, "elapsed_ms": round(elapsed_ms, 3),
+                           "bytes": len(self.document.body), "etag": self.document.etag})
+        return self.document
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header value allows a gzip response."""
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "x-gzip", "*"):
+            continue
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header value against etag (RFC 9110, 13.1.2)."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class DevServer(HTTPServer):
+    """asyncio HTTP/1.1 server for the live spec, the Swagger UI page and external examples."""
+
+    def __init__(self, live_spec):
+        self.live_spec = live_spec
+
+    async def handle(self, request, reader, writer):
+        method, path, headers, keep_alive = request.method, request.path, request.headers, request.keep_alive
+        if headers.get("content-length", "0").isdigit() and int(headers.get("content-length", "0")):
+            await reader.readexactly(int(headers["content-length"]))
+
+        if method not in ("GET", "HEAD"):
+            await respond(writer, 405, b"Method Not Allowed", {"Allow": "GET, HEAD"}, keep_alive)
+        elif path == SPEC_PATH:
+            await self._serve_spec(writer, method, headers, keep_alive)
+        elif path in ("/", "/index.html"):
+            await respond(writer, 200, SWAGGER_UI_PAGE, {"Content-Type": "text/html; charset=utf-8"},
+                          keep_alive, method == "HEAD")
+        else:
+            await self._serve_file(writer, method, path, keep_alive)
+        return keep_alive
+
+    async def _serve_spec(self, writer, method, headers, keep_alive):
+        document = self.live_spec.document
+        gzipped = accepts_gzip(headers.get("accept-encoding", ""))
+        # Strong ETags must differ between the plain and the gzip representation
+        etag = f'"{document.etag}-gzip"' if gzipped else f'"{document.etag}"'
+        response_headers = {
+            "Content-Type": "application/json",
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Expose-Headers": "ETag",
+        }
+        if etag_matches(headers.get("if-none-match", ""), etag):
+            await respond(writer, 304, b"", response_headers, keep_alive, head_only=True)
+            return
+        if gzipped:
+            response_headers["Content-Encoding"] = "gzip"
+        body = document.gzip_body if gzipped else document.body
+        await respond(writer, 200, body, response_headers, keep_alive, method == "HEAD")
+
+    async def _serve_file(self, writer, method, path, keep_alive):
+        # Only examples written by --example-mode external are served from disk
+        examples_dir = os.path.realpath(os.path.join(self.live_spec.output_dir, EXTERNAL_EXAMPLES_DIR))
+        file_path = os.path.realpath(os.path.join(self.live_spec.output_dir, path.lstrip("/")))
+        if not file_path.startswith(examples_dir + os.sep) or not os.path.isfile(file_path):
+            await respond(writer, 404, b"Not Found", {}, keep_alive, method == "HEAD")
+            return
+        with open(file_path, "rb") as f:
+            body = f.read()
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        await respond(writer, 200, body, {"Content-Type": content_type, "Access-Control-Allow-Origin": "*"},
+                      keep_alive, method == "HEAD")
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        return await super().start(host, port)
+
+
+async def watch_registry(live_spec, watcher, poll_interval=DEFAULT_POLL_INTERVAL, debounce=DEFAULT_DEBOUNCE):
+    """Polls watcher and rebuilds the changed subnets once no change was seen for debounce seconds."""
+    pending = set()
+    last_change = None
+    while True:
+        await asyncio.sleep(min(poll_interval, debounce) if pending else poll_interval)
+        changed = await asyncio.to_thread(watcher.poll)
+        if changed:
+            pending |= changed
+            last_change = time.monotonic()
+            continue
+        if pending and time.monotonic() - last_change >= debounce:
+            subnet_ids, pending = pending, set()
+            try:
+                await asyncio.to_thread(live_spec.rebuild, subnet_ids)
+            except Exception:
+                # Keep serving the last good spec until the next change
+                logger.exception(f"Rebuilding subnet {', '.join(sorted(subnet_ids))} failed",
+                                 extra={"subnets": sorted(subnet_ids)})
+
+
+async def _serve(live_spec, watcher, host, port, poll_interval, debounce):
+    server = await DevServer(live_spec).start(host, port)
+    logger.info(f"Serving the spec at http://{host}:{port}{SPEC_PATH} and Swagger UI at http://{host}:{port}/, "
+                f"watching {watcher.api_definitions_path}")
+    async with server:
+        await asyncio.gather(server.serve_forever(), watch_registry(live_spec, watcher, poll_interval, debounce))
+
+
+def serve(api_definitions_path, output_file, host="127.0.0.1", port=DEFAULT_PORT,
+          poll_interval=DEFAULT_POLL_INTERVAL, debounce=DEFAULT_DEBOUNCE, force_polling=False, **build_options):
+    """Builds the spec, then serves it and rebuilds changed subnets until interrupted.
+
+       build_options are the LiveSpec options (cache_dir, jobs, dedupe_schemas, example_* and compact)."""
+    # Start watching before the first build so edits made during it are picked up
+    watcher = create_watcher(api_definitions_path, force_polling)
+    live_spec = LiveSpec(api_definitions_path, os.path.dirname(output_file) or ".", **build_options)
+    live_spec.rebuild()
+    try:
+        asyncio.run(_serve(live_spec, watcher, host, port, poll_interval, debounce))
+    except KeyboardInterrupt:
+        pass
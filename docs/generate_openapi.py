@@ -1,12 +1,41 @@
 import yaml
 import os
+import re
+import sys
 import json
+import copy
+import shutil
+import hashlib
+import gzip
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
-def generate_openapi(api_definitions_path, output_file):
-    """Generates an OpenAPI specification with subnet ID in paths, 
-       fixed Bearer auth, ordered by subnet ID, and includes examples from examples/ directory."""
+import columnar
+from build_telemetry import (
+    logger, current_subnet, stage, configure_logging, enable_profiling, disable_profiling,
+    profiling_enabled, record_events, summarize_events, write_trace
+)
 
-    openapi = {
+try:
+    import brotli
+except ImportError:  # optional, only needed for --compress br
+    brotli = None
+
+# Use libyaml's C loader when PyYAML was built with it, it parses several times faster
+YamlSafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Bump this whenever the shape of the cached fragments changes
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = "./.openapi-cache"
+# Marks a directory as a build cache (https://bford.info/cachedir/); only such directories are pruned
+CACHE_MARKER = "CACHEDIR.TAG"
+CACHE_MARKER_CONTENT = "Signature: 8a477f597d28d172789f06886806bc55\n# openapi.json build cache\n"
+CACHE_ENTRY_PATTERN = re.compile(r"^\d+\.json$")
+
+
+def create_openapi_base():
+    """Returns the static part of the OpenAPI document (everything except paths)."""
+    return {
         "openapi": "3.0.0",
         "info": {
             "title": "BitMind Intelligence Oracle",
@@ -31,339 +60,1202 @@ def generate_openapi(api_definitions_path, output_file):
         "security": [{"bearerAuth": []}]  # Added global security
     }
 
-    # Helper function to add defaults to schema properties
-    def add_defaults_to_schema(schema):
-        if not isinstance(schema, dict):
-            return schema
 
-        # Handle arrays
-        if schema.get("type") == "array" and "items" in schema:
-            schema["items"] = add_defaults_to_schema(schema["items"])
+# Helper function to add defaults to schema properties
+def add_defaults_to_schema(schema):
+    if not isinstance(schema, dict):
+        return schema
+
+    # Handle arrays
+    if schema.get("type") == "array" and "items" in schema:
+        schema["items"] = add_defaults_to_schema(schema["items"])
+        return schema
+
+    # Handle objects and their properties
+    if "properties" in schema:
+        for prop_name, prop_details in schema["properties"].items():
+            schema["properties"][prop_name] = add_defaults_to_schema(prop_details)
+
+    # Convert examples -> example
+    if "examples" in schema:
+        schema["example"] = schema["examples"][0]
+        del schema["examples"]
+
+    # Handle min/max values
+    if "exclusiveMinimum" in schema:
+        if not isinstance(schema["exclusiveMinimum"], bool):
+            logger.warning(f"exclusiveMinimum must be a boolean value in {schema}",
+                           extra={"keyword": "exclusiveMinimum", "value": schema["exclusiveMinimum"]})
+            if "minimum" not in schema:
+                schema["minimum"] = schema["exclusiveMinimum"]
+            del schema["exclusiveMinimum"]
+    if "exclusiveMaximum" in schema:
+        if not isinstance(schema["exclusiveMaximum"], bool):
+            logger.warning(f"exclusiveMaximum must be a boolean value in {schema}",
+                           extra={"keyword": "exclusiveMaximum", "value": schema["exclusiveMaximum"]})
+            if "maximum" not in schema:
+                schema["maximum"] = schema["exclusiveMaximum"]
+            del schema["exclusiveMaximum"]
+
+    # Add defaults for basic types if not present
+    if "type" in schema and "default" not in schema and "example" not in schema:
+        # Don't add defaults if there's an enum
+        if "enum" not in schema:
+            if schema["type"] == "string":
+                schema["default"] = ""
+            elif schema["type"] == "integer":
+                schema["default"] = 0
+            elif schema["type"] == "boolean":
+                schema["default"] = False
+            elif schema["type"] == "number":
+                schema["default"] = 0.0
+
+    return schema
+
+
+# Generate possible directory names for an endpoint path
+def get_possible_directory_names(endpoint_path):
+    # Remove leading and trailing slashes
+    path_clean = endpoint_path.strip('/')
+
+    # Generate possible directory names with different separators
+    return [
+        path_clean,                          # path/to/endpoint
+        path_clean.replace('/', '_'),        # path_to_endpoint
+        path_clean.replace('/', '-'),        # path-to-endpoint
+        path_clean.replace('-', '_'),        # path_to_endpoint (if path has hyphens)
+        path_clean.replace('-', '/').replace('/', '_'),  # path_to_endpoint (if path has hyphens and slashes)
+        endpoint_path.lstrip('/')            # path/to/endpoint (without leading slash)
+    ]
+
+
+EXAMPLE_FILE_TYPES = ("request", "response")
+
+
+def example_file_type(relative_dir, file_name):
+    """The example type ("request"/"response") of a file in examples/<relative_dir>, or None for
+       files the generator does not read (e.g. media next to the examples)."""
+    file_type, ext = os.path.splitext(file_name)
+    if relative_dir and ext == ".json" and file_type in EXAMPLE_FILE_TYPES:
+        return file_type
+    return None
+
+
+def normalize_example_name(name):
+    """Collapses the separator variants of get_possible_directory_names() into one key."""
+    return name.strip('/').replace('-', '_').replace('/', '_')
+
+
+class ExampleIndex:
+    """Index of a subnet's examples/ directory, built with a single recursive os.scandir pass.
+
+       Maps each example directory (relative, '/'-separated) to the example files it holds, so
+       resolving an endpoint's examples is a handful of dict lookups instead of stat calls."""
+
+    def __init__(self, examples_dir):
+        self.examples_dir = examples_dir
+        self.files = {}  # relative dir -> {file_type: absolute file path}
+        self.used = set()
+        if os.path.isdir(examples_dir):
+            self._scan(examples_dir, "")
+
+    def _scan(self, directory, relative_dir):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    child = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                    self._scan(entry.path, child)
+                elif entry.is_file():
+                    file_type = example_file_type(relative_dir, entry.name)
+                    if file_type:
+                        self.files.setdefault(relative_dir, {})[file_type] = os.path.join(self.examples_dir, relative_dir, entry.name)
+
+    def load(self, subnet_id, endpoint_path, file_type):
+        """Loads the example of endpoint_path, trying candidate directories in priority order."""
+        for dir_name in get_possible_directory_names(endpoint_path):
+            example_file = self.files.get(dir_name, {}).get(file_type)
+            if example_file is None:
+                continue
+            self.used.add(dir_name)
+            try:
+                with open(example_file, "r") as f:
+                    example = json.load(f)
+                logger.debug(f"Loaded {file_type} example for {subnet_id}{endpoint_path} from {example_file}",
+                             extra={"endpoint": endpoint_path, "example_type": file_type, "file": example_file})
+                return example
+            except Exception as e:
+                logger.error(f"Error loading example file {example_file}: {e}",
+                             extra={"endpoint": endpoint_path, "example_type": file_type, "file": example_file})
+
+        return None
+
+    def ambiguous(self):
+        """Returns groups of example directories that normalize to the same endpoint name."""
+        groups = {}
+        for dir_name in self.files:
+            groups.setdefault(normalize_example_name(dir_name), []).append(dir_name)
+        return {name: sorted(dirs) for name, dirs in groups.items() if len(dirs) > 1}
+
+    def orphaned(self):
+        """Returns example directories that no endpoint loaded an example from."""
+        return sorted(dir_name for dir_name in self.files if dir_name not in self.used)
+
+    def report(self, subnet_id):
+        for name, dirs in sorted(self.ambiguous().items()):
+            logger.warning(f"Ambiguous example directories for {subnet_id}/{name}: {', '.join(dirs)}",
+                           extra={"subnet_id": subnet_id, "directories": dirs})
+        for dir_name in self.orphaned():
+            example_dir = os.path.join(self.examples_dir, dir_name)
+            logger.warning(f"Example directory {example_dir} is not used by any endpoint",
+                           extra={"subnet_id": subnet_id, "directory": example_dir})
+
+
+def discover_subnets(api_definitions_path):
+    """Returns the subnet ID directories under api_definitions_path, ordered by subnet ID."""
+    subnet_ids = [
+        entry.name for entry in os.scandir(api_definitions_path)
+        if entry.is_dir() and entry.name.isdigit()
+    ]
+    return sorted(subnet_ids, key=lambda subnet_id: (int(subnet_id), subnet_id))
+
+
+def list_definition_files(subnet_dir):
+    """Returns the api definition files (*.yml / *.yaml) of a subnet directory in a stable order."""
+    return sorted(
+        entry.name for entry in os.scandir(subnet_dir)
+        if entry.is_file() and (entry.name.endswith(".yml") or entry.name.endswith(".yaml"))
+    )
+
+
+def endpoint_route_path(subnet_id, endpoint):
+    """Returns the Oracle path of an endpoint: /<subnet id><path>, followed by a /{param}
+       segment for every path parameter that appears in its externalPath."""
+    endpoint_path = endpoint['path']
+
+    # Handle path parameters in the path
+    path_with_params = endpoint_path if endpoint_path.startswith('/') else f"/{endpoint_path}"
+    if endpoint.get("pathParams"):
+        # If the endpoint has path parameters, modify the path to include them
+        for param in endpoint.get("pathParams"):
+            param_name = param.get("name")
+            # If the external path contains this parameter in {param} format
+            if "{" + param_name + "}" in endpoint.get("externalPath", ""):
+                # Add the parameter to the path
+                path_with_params = f"{path_with_params}/{{{param_name}}}"
+
+    # Make path unique by adding subnet ID as a prefix
+    return f"/{subnet_id}{path_with_params}"
+
+
+def build_endpoint(example_index, subnet_id, data, endpoint):
+    """Converts a single registry endpoint into (path, method, OpenAPI operation object)."""
+    endpoint_path = endpoint['path']
+    method = endpoint["method"].lower()
+    path = endpoint_route_path(subnet_id, endpoint)
+    summary = endpoint.get("summary", f"{method.upper()} {path}")
+    description = endpoint.get("description", "")
+    request_body_schema = endpoint.get("requestSchema")
+
+    # Add default values
+    if request_body_schema:
+        with stage("schema_normalization", subnet_id):
+            request_body_schema = add_defaults_to_schema(request_body_schema)
+
+    # Get content type from headers or default to application/json
+    content_type = endpoint.get("headers", {}).get("Content-Type", "application/json")
+
+    # Load examples from the subnet's example index
+    with stage("example_loading", subnet_id):
+        request_example = example_index.load(subnet_id, endpoint_path, "request")
+        response_example = example_index.load(subnet_id, endpoint_path, "response")
+
+    # Handle different content types appropriately
+    if content_type == "multipart/form-data" and request_body_schema:
+        # For multipart/form-data, handle file uploads correctly
+        # Transform properties with type: file to binary format
+        with stage("multipart_conversion", subnet_id):
+            form_schema = {
+                "type": "object",
+                "properties": {},
+                "required": request_body_schema.get("required", [])
+            }
+
+            for prop_name, prop_details in request_body_schema.get("properties", {}).items():
+                if prop_details.get("type") == "file":
+                    # For file uploads, use binary format
+                    form_schema["properties"][prop_name] = {
+                        "type": "string",
+                        "format": "binary",
+                        "description": prop_details.get("description", "")
+                    }
+                else:
+                    # For non-file properties
+                    form_schema["properties"][prop_name] = prop_details
+
+        request_body = {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": form_schema
+                }
+            }
+        }
+
+        # Add example if available
+        if request_example:
+            request_body["content"]["multipart/form-data"]["example"] = request_example
+    else:
+        # Default case for application/json
+        request_body = {
+            "required": True,
+            "content": {
+                content_type: {
+                    "schema": request_body_schema
+                }
+            }
+        } if request_body_schema else None
+
+        # Process schema properties
+        if request_body and request_body_schema and "properties" in request_body_schema:
+            for prop_name, prop_details in request_body_schema["properties"].items():
+                if "exclusiveMinimum" in prop_details:
+                    if not isinstance(prop_details["exclusiveMinimum"], bool):
+                        if "minimum" not in prop_details:
+                            prop_details["minimum"] = prop_details["exclusiveMinimum"]
+                        del prop_details["exclusiveMinimum"]
+                if "exclusiveMaximum" in prop_details:
+                    if not isinstance(prop_details["exclusiveMaximum"], bool):
+                        if "maximum" not in prop_details:
+                            prop_details["maximum"] = prop_details["exclusiveMaximum"]
+                        del prop_details["exclusiveMaximum"]
+
+        # Add example if available
+        if request_example and request_body:
+            request_body["content"][content_type]["example"] = request_example
+
+    # Create responses object with example if available
+    responses = {
+        "200": {
+            "description": "Successful response"
+        }
+    }
+
+    # Add response example if available
+    if response_example:
+        responses["200"]["content"] = {
+            "application/json": {
+                "example": response_example
+            }
+        }
+
+    # Document alternative encodings of the response, selected with the Accept header
+    for encoding, declaration in (endpoint.get("responseEncodings") or {}).items():
+        if encoding != "columnar":
+            logger.warning(f"Unknown response encoding {encoding!r} for {endpoint_path}",
+                           extra={"endpoint": endpoint_path, "encoding": encoding})
+            continue
+        try:
+            media_type, fields = columnar.parse_declaration(declaration)
+            media = {"schema": columnar.columnar_schema(fields, media_type)}
+            if isinstance(response_example, dict):
+                media["example"] = columnar.encode_response(response_example, fields)
+        except ValueError as e:
+            logger.warning(f"Invalid columnar encoding for {endpoint_path}: {e}",
+                           extra={"endpoint": endpoint_path, "encoding": encoding})
+            continue
+        responses["200"].setdefault("content", {})[media_type] = media
+
+    # Handle query parameters for GET requests and others that use them
+    parameters = []
+    if endpoint.get("queryParams"):
+        for param in endpoint.get("queryParams"):
+            param_obj = {
+                "name": param.get("name"),
+                "in": "query",
+                "description": param.get("description", ""),
+                "required": param.get("required", False)
+            }
+
+            # Set schema type based on param type
+            param_type = param.get("type", "string")
+            if param_type == "array":
+                param_obj["schema"] = {
+                    "type": "array",
+                    "items": {
+                        "type": param.get("items", {}).get("type", "string")
+                    }
+                }
+                # Copy any additional properties from items
+                if "items" in param and isinstance(param["items"], dict):
+                    param_obj["schema"]["items"].update(param["items"])
+            else:
+                param_obj["schema"] = {"type": param_type}
+
+            # Handle enum values
+            if "enum" in param:
+                param_obj["schema"]["enum"] = param["enum"]
+                # Use first enum value as default only if no default specified
+                if "default" not in param:
+                    param_obj["schema"]["default"] = param["enum"][0]
+
+            # Handle min/max values
+            if "minimum" in param:
+                param_obj["schema"]["minimum"] = param["minimum"]
+            if "maximum" in param:
+                param_obj["schema"]["maximum"] = param["maximum"]
+            if "exclusiveMinimum" in param:
+                if not isinstance(param["exclusiveMinimum"], bool):
+                    logger.warning(f"exclusiveMinimum must be a boolean value in {param}",
+                                   extra={"endpoint": endpoint_path, "parameter": param.get("name"),
+                                          "keyword": "exclusiveMinimum"})
+                    continue
+                param_obj["schema"]["exclusiveMinimum"] = param["exclusiveMinimum"]
+            if "exclusiveMaximum" in param:
+                if not isinstance(param["exclusiveMaximum"], bool):
+                    logger.warning(f"exclusiveMaximum must be a boolean value in {param}",
+                                   extra={"endpoint": endpoint_path, "parameter": param.get("name"),
+                                          "keyword": "exclusiveMaximum"})
+                    continue
+                param_obj["schema"]["exclusiveMaximum"] = param["exclusiveMaximum"]
+
+            # Handle default values
+            if "default" in param:
+                param_obj["schema"]["default"] = param["default"]
+
+            parameters.append(param_obj)
+
+    # Handle path parameters
+    if endpoint.get("pathParams"):
+        for param in endpoint.get("pathParams"):
+            param_obj = {
+                "name": param.get("name"),
+                "in": "path",
+                "description": param.get("description", ""),
+                "required": param.get("required", True),
+                "schema": {"type": param.get("type", "string")}
+            }
+            parameters.append(param_obj)
+
+    # Create the endpoint object
+    endpoint_obj = {
+        "summary": summary,
+        "description": description,
+        "responses": responses,
+        "tags": [data.get('name', f'Subnet {subnet_id}')],  # Add subnet name as a tag
+        "operationId": f"{data.get('name', f'Subnet {subnet_id}')}_{endpoint_path.replace('/', '_')}"  # Add operationId for unique identification
+    }
+
+    # Add parameters if exist
+    if parameters:
+        endpoint_obj["parameters"] = parameters
+
+    # Add request body if exists
+    if request_body:
+        endpoint_obj["requestBody"] = request_body
+
+    # For GET requests with query parameters, add examples to parameters
+    if method.lower() == "get" and endpoint.get("queryParams") and request_example:
+        # Update individual parameter examples
+        if isinstance(request_example, dict):
+            for param in endpoint_obj.get("parameters", []):
+                if param["name"] in request_example:
+                    param["example"] = request_example[param["name"]]
+
+    return path, method, endpoint_obj
+
+
+def build_subnet_paths(api_definitions_path, subnet_id):
+    """Builds the path fragment of a single subnet: an ordered list of [path, method, operation]."""
+    token = current_subnet.set(subnet_id)
+    try:
+        with stage("subnet", subnet_id):
+            return _build_subnet_paths(api_definitions_path, subnet_id)
+    finally:
+        current_subnet.reset(token)
+
+
+def _build_subnet_paths(api_definitions_path, subnet_id):
+    subnet_dir = os.path.join(api_definitions_path, subnet_id)
+    with stage("example_index", subnet_id):
+        example_index = ExampleIndex(os.path.join(subnet_dir, "examples"))
+
+    # Keyed like the merged spec so a later definition of the same route replaces an earlier one
+    subnet_paths = {}
+    for file in list_definition_files(subnet_dir):
+        file_path = os.path.join(subnet_dir, file)
+        try:
+            with open(file_path, "r") as f:
+                with stage("yaml_parse", subnet_id):
+                    data = yaml.load(f, Loader=YamlSafeLoader)
+
+                if "endpoints" in data:
+                    for endpoint in data["endpoints"]:
+                        path, method, endpoint_obj = build_endpoint(example_index, subnet_id, data, endpoint)
+                        subnet_paths[(path, method)] = endpoint_obj
+        except yaml.YAMLError as e:
+            logger.error(f"Error reading YAML file {file_path}: {e}", extra={"file": file_path})
+
+    example_index.report(subnet_id)
+
+    return [[path, method, endpoint_obj] for (path, method), endpoint_obj in subnet_paths.items()]
+
+
+def _build_subnet_paths_profiled(api_definitions_path, subnet_id):
+    # Runs in a worker process: profile there and ship the events back with the fragment
+    enable_profiling()
+    try:
+        return build_subnet_paths(api_definitions_path, subnet_id), disable_profiling()
+    except BaseException:
+        disable_profiling()
+        raise
+
+
+def build_subnets(api_definitions_path, subnet_ids, jobs=1):
+    """Builds the path fragments of subnet_ids, in worker processes when jobs > 1.
+
+       Returns a dict mapping subnet ID to its fragment. Falls back to a serial build
+       when a process pool cannot be started on this platform."""
+    if jobs > 1 and len(subnet_ids) > 1:
+        try:
+            profiled = profiling_enabled()
+            with ProcessPoolExecutor(max_workers=min(jobs, len(subnet_ids))) as executor:
+                results = executor.map(_build_subnet_paths_profiled if profiled else build_subnet_paths,
+                                       [api_definitions_path] * len(subnet_ids), subnet_ids)
+                fragments = {}
+                for subnet_id, result in zip(subnet_ids, results):
+                    if profiled:
+                        result, events = result
+                        record_events(events)
+                    fragments[subnet_id] = result
+                return fragments
+        except (OSError, NotImplementedError) as e:
+            logger.warning(f"Parallel build unavailable ({e}), falling back to serial mode")
+
+    return {subnet_id: build_subnet_paths(api_definitions_path, subnet_id) for subnet_id in subnet_ids}
+
+
+def _generator_fingerprint():
+    # Any change to the generator itself (or the encoder it documents examples with) invalidates
+    # every cached fragment
+    digest = hashlib.sha256()
+    for module_file in (__file__, columnar.__file__):
+        with open(os.path.abspath(module_file), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def subnet_content_hash(api_definitions_path, subnet_id, salt=""):
+    """Hashes a subnet's definition files and the example files ExampleIndex reads (names and
+       contents). Other files under examples/, such as sample videos, cannot change the output
+       and are not read."""
+    subnet_dir = os.path.join(api_definitions_path, subnet_id)
+    digest = hashlib.sha256()
+    digest.update(f"{CACHE_VERSION}:{salt}".encode())
+
+    relative_files = list_definition_files(subnet_dir)
+    examples_dir = os.path.join(subnet_dir, "examples")
+    for root, dirs, files in os.walk(examples_dir):
+        dirs.sort()
+        relative_dir = os.path.relpath(root, examples_dir).replace(os.sep, "/")
+        for file in sorted(files):
+            if example_file_type("" if relative_dir == "." else relative_dir, file):
+                relative_files.append(os.path.relpath(os.path.join(root, file), subnet_dir))
+
+    for relative_file in relative_files:
+        digest.update(b"\0" + relative_file.replace(os.sep, "/").encode() + b"\0")
+        with open(os.path.join(subnet_dir, relative_file), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def is_cache_dir(cache_dir):
+    """Whether cache_dir is (or can become) a build cache: it carries the marker, or holds
+       nothing but cache entries, e.g. one written before the marker existed."""
+    return os.path.exists(os.path.join(cache_dir, CACHE_MARKER)) or all(
+        CACHE_ENTRY_PATTERN.match(name.removesuffix(".tmp")) for name in os.listdir(cache_dir))
+
+
+class BuildCache:
+    """Per-subnet fragment cache stored as one JSON file per subnet in cache_dir."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.salt = _generator_fingerprint()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.marker_path = os.path.join(cache_dir, CACHE_MARKER)
+        # Claim the directory only if nothing but cache entries lives in it
+        if not os.path.exists(self.marker_path) and is_cache_dir(cache_dir):
+            with open(self.marker_path, "w") as f:
+                f.write(CACHE_MARKER_CONTENT)
+
+    def _entry_path(self, subnet_id):
+        return os.path.join(self.cache_dir, f"{subnet_id}.json")
+
+    def load(self, subnet_id, content_hash):
+        entry_path = self._entry_path(subnet_id)
+        if not os.path.exists(entry_path):
+            return None
+        try:
+            with open(entry_path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {entry_path}: {e}", extra={"file": entry_path})
+            return None
+        if entry.get("hash") != content_hash:
+            return None
+        return entry["paths"]
+
+    def store(self, subnet_id, content_hash, subnet_paths):
+        entry_path = self._entry_path(subnet_id)
+        tmp_path = f"{entry_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"hash": content_hash, "paths": subnet_paths}, f)
+        os.replace(tmp_path, entry_path)
+
+    def prune(self, subnet_ids):
+        """Removes entries of subnets that no longer exist in the registry. Only files the cache
+           writes itself are touched, and only in a directory carrying the cache marker."""
+        if not os.path.exists(self.marker_path):
+            logger.warning(f"Not pruning {self.cache_dir}: it has no {CACHE_MARKER} and may hold other files",
+                           extra={"directory": self.cache_dir})
+            return
+        keep = {f"{subnet_id}.json" for subnet_id in subnet_ids}
+        for entry in os.scandir(self.cache_dir):
+            if CACHE_ENTRY_PATTERN.match(entry.name) and entry.name not in keep:
+                subnet_id = entry.name[:-len(".json")]
+                logger.info(f"Removing cache entry for deleted subnet {subnet_id}", extra={"subnet_id": subnet_id})
+                os.remove(entry.path)
+
+
+# Schema keywords whose values are themselves schemas
+SCHEMA_CHILD_KEYS = ("items", "additionalProperties", "not")
+SCHEMA_LIST_KEYS = ("allOf", "anyOf", "oneOf")
+# Subschemas whose canonical form is shorter than this are cheaper inline than as a $ref
+DEDUPE_MIN_SCHEMA_BYTES = 64
+
+
+def _canonical(value, memo):
+    """Canonical JSON text of value (sorted keys, no whitespace), memoized per dict object."""
+    if isinstance(value, dict):
+        key = id(value)
+        if key not in memo:
+            members = ",".join(
+                f"{json.dumps(str(k))}:{_canonical(value[k], memo)}"
+                for k in sorted(value, key=str)
+            )
+            memo[key] = "{" + members + "}"
+        return memo[key]
+    if isinstance(value, list):
+        return "[" + ",".join(_canonical(item, memo) for item in value) + "]"
+    return json.dumps(value)
+
+
+def _iter_subschemas(schema, name):
+    """Yields (name, subschema) for schema and every schema nested in it, parents first."""
+    if not isinstance(schema, dict) or "$ref" in schema:
+        return
+    yield name, schema
+    properties = schema.get("properties")
+    if isinstance(properties, dict):
+        for prop_name, prop_details in properties.items():
+            yield from _iter_subschemas(prop_details, prop_name)
+    for key in SCHEMA_CHILD_KEYS:
+        yield from _iter_subschemas(schema.get(key), f"{name}_{key}")
+    for key in SCHEMA_LIST_KEYS:
+        for i, subschema in enumerate(schema.get(key) or []):
+            yield from _iter_subschemas(subschema, f"{name}_{key}{i}")
+
+
+def _iter_schema_slots(openapi):
+    """Yields (container, key, name) for every schema referenced from an operation."""
+    for operations in openapi["paths"].values():
+        for operation in operations.values():
+            operation_id = operation.get("operationId", "Schema")
+            for param in operation.get("parameters", []):
+                if "schema" in param:
+                    yield param, "schema", param.get("name", operation_id)
+            for media in operation.get("requestBody", {}).get("content", {}).values():
+                if "schema" in media:
+                    yield media, "schema", f"{operation_id}_request"
+            for response in operation.get("responses", {}).values():
+                for media in response.get("content", {}).values():
+                    if "schema" in media:
+                        yield media, "schema", f"{operation_id}_response"
+
+
+def _iter_refs(value):
+    if isinstance(value, dict):
+        if "$ref" in value:
+            yield value["$ref"]
+        for item in value.values():
+            yield from _iter_refs(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _iter_refs(item)
+
+
+def _component_name(name, canonical):
+    safe_name = "".join(c if c.isalnum() or c in "._-" else "_" for c in name).strip("_") or "Schema"
+    return f"{safe_name}_{hashlib.sha256(canonical.encode()).hexdigest()[:8]}"
+
+
+def deduplicate_schemas(openapi, min_bytes=DEDUPE_MIN_SCHEMA_BYTES):
+    """Moves subschemas that occur more than once into components/schemas and replaces
+       every occurrence with a $ref. Subschemas are compared structurally (key order and
+       object identity do not matter). Operates in place and returns openapi."""
+    memo = {}
+    counts = {}
+    names = {}
+    slots = list(_iter_schema_slots(openapi))
+    for container, key, name in slots:
+        for sub_name, subschema in _iter_subschemas(container[key], name):
+            canonical = _canonical(subschema, memo)
+            counts[canonical] = counts.get(canonical, 0) + 1
+            names.setdefault(canonical, sub_name)
+
+    repeated = {canonical for canonical, count in counts.items() if count > 1 and len(canonical) >= min_bytes}
+    if not repeated:
+        return openapi
+
+    components = {}  # canonical -> [component name, rewritten schema], in order of first use
+
+    def rewrite_children(schema):
+        rewritten = dict(schema)
+        if isinstance(schema.get("properties"), dict):
+            rewritten["properties"] = {
+                prop_name: intern(prop_details) for prop_name, prop_details in schema["properties"].items()
+            }
+        for key in SCHEMA_CHILD_KEYS:
+            if isinstance(schema.get(key), dict):
+                rewritten[key] = intern(schema[key])
+        for key in SCHEMA_LIST_KEYS:
+            if isinstance(schema.get(key), list):
+                rewritten[key] = [intern(subschema) for subschema in schema[key]]
+        return rewritten
+
+    def intern(schema):
+        if not isinstance(schema, dict) or "$ref" in schema:
             return schema
+        canonical = _canonical(schema, memo)
+        if canonical not in repeated:
+            return rewrite_children(schema)
+        if canonical not in components:
+            entry = components[canonical] = [_component_name(names[canonical], canonical), None]
+            entry[1] = rewrite_children(schema)
+        return {"$ref": f"#/components/schemas/{components[canonical][0]}"}
 
-        # Handle objects and their properties
-        if "properties" in schema:
-            for prop_name, prop_details in schema["properties"].items():
-                schema["properties"][prop_name] = add_defaults_to_schema(prop_details)
-
-        # Convert examples -> example
-        if "examples" in schema:
-            schema["example"] = schema["examples"][0]
-            del schema["examples"]
-
-        # Handle min/max values
-        if "exclusiveMinimum" in schema:
-            if not isinstance(schema["exclusiveMinimum"], bool):
-                print(f"Warning: exclusiveMinimum must be a boolean value in {schema}")
-                if "minimum" not in schema:
-                    schema["minimum"] = schema["exclusiveMinimum"]
-                del schema["exclusiveMinimum"]
-        if "exclusiveMaximum" in schema:
-            if not isinstance(schema["exclusiveMaximum"], bool):
-                print(f"Warning: exclusiveMaximum must be a boolean value in {schema}")
-                if "maximum" not in schema:
-                    schema["maximum"] = schema["exclusiveMaximum"]
-                del schema["exclusiveMaximum"]
-
-        # Add defaults for basic types if not present
-        if "type" in schema and "default" not in schema and "example" not in schema:
-            # Don't add defaults if there's an enum
-            if "enum" not in schema:
-                if schema["type"] == "string":
-                    schema["default"] = ""
-                elif schema["type"] == "integer":
-                    schema["default"] = 0
-                elif schema["type"] == "boolean":
-                    schema["default"] = False
-                elif schema["type"] == "number":
-                    schema["default"] = 0.0
+    for container, key, _ in slots:
+        container[key] = intern(container[key])
 
+    # A subschema repeated only inside an extracted component ends up with a single use, inline it again
+    schemas = {name: schema for name, schema in components.values()}
+    ref_counts = {}
+    for schema in [container[key] for container, key, _ in slots] + list(schemas.values()):
+        for ref in _iter_refs(schema):
+            ref_counts[ref] = ref_counts.get(ref, 0) + 1
+    single_use = {name for name in schemas if ref_counts.get(f"#/components/schemas/{name}", 0) < 2}
+
+    def inline(schema):
+        if isinstance(schema, dict):
+            ref = schema.get("$ref", "")
+            name = ref[len("#/components/schemas/"):]
+            if ref.startswith("#/components/schemas/") and name in single_use:
+                return inline(schemas[name])
+            return {key: inline(value) for key, value in schema.items()}
+        if isinstance(schema, list):
+            return [inline(item) for item in schema]
         return schema
 
-    # Generate possible directory names for an endpoint path
-    def get_possible_directory_names(endpoint_path):
-        # Remove leading and trailing slashes
-        path_clean = endpoint_path.strip('/')
-        
-        # Generate possible directory names with different separators
-        return [
-            path_clean,                          # path/to/endpoint
-            path_clean.replace('/', '_'),        # path_to_endpoint
-            path_clean.replace('/', '-'),        # path-to-endpoint
-            path_clean.replace('-', '_'),        # path_to_endpoint (if path has hyphens)
-            path_clean.replace('-', '/').replace('/', '_'),  # path_to_endpoint (if path has hyphens and slashes)
-            endpoint_path.lstrip('/')            # path/to/endpoint (without leading slash)
-        ]
-    
-    # Load an example file if it exists
-    def load_example_file(subnet_id, endpoint_path, file_type):
-        # Try different possible directory names
-        possible_dirs = get_possible_directory_names(endpoint_path)
-        
-        for dir_name in possible_dirs:
-            example_dir = os.path.join(api_definitions_path, subnet_id, "examples", dir_name)
-            example_file = os.path.join(example_dir, f"{file_type}.json")
-            
-            if os.path.exists(example_file):
-                try:
-                    with open(example_file, "r") as f:
-                        print(f"Loaded {file_type} example for {subnet_id}{endpoint_path} from {example_file}")
-                        return json.load(f)
-                except Exception as e:
-                    print(f"Error loading example file {example_file}: {e}")
-        
-        return None
+    if single_use:
+        for container, key, _ in slots:
+            container[key] = inline(container[key])
+        schemas = {name: inline(schema) for name, schema in schemas.items() if name not in single_use}
+
+    if schemas:
+        openapi["components"].setdefault("schemas", {}).update(schemas)
+    return openapi
+
+
+EXAMPLE_MODES = ("summarize", "external")
+DEFAULT_EXAMPLE_ARRAY_ITEMS = 3
+EXTERNAL_EXAMPLES_DIR = "examples"
 
-    # Collect paths first, then sort
-    all_paths = {}
-    
-    for root, _, files in os.walk(api_definitions_path):
-        # Extract the subnet ID from the directory path.
-        subnet_id = os.path.basename(root)
-        if not subnet_id.isdigit():  # Skip if not a digit folder
+
+def example_size(value):
+    """Size in bytes of an example serialized as compact JSON."""
+    return len(json.dumps(value, separators=(",", ":")).encode())
+
+
+def truncate_example(value, max_items):
+    """Truncates every array in value to max_items items, followed by a marker string."""
+    if isinstance(value, list):
+        items = [truncate_example(item, max_items) for item in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"... {len(value) - max_items} more items")
+        return items
+    if isinstance(value, dict):
+        return {key: truncate_example(item, max_items) for key, item in value.items()}
+    return value
+
+
+def _iter_media_examples(openapi):
+    """Yields (path, method, location, media type, media object) for every inline media type example."""
+    for path, operations in openapi["paths"].items():
+        for method, operation in operations.items():
+            for media_type, media in operation.get("requestBody", {}).get("content", {}).items():
+                if "example" in media:
+                    yield path, method, "request", media_type, media
+            for status, response in operation.get("responses", {}).items():
+                for media_type, media in response.get("content", {}).items():
+                    if "example" in media:
+                        yield path, method, f"response-{status}", media_type, media
+
+
+def _slug(value):
+    return "".join(c if c.isalnum() else "-" for c in value).strip("-")
+
+
+def apply_example_budget(openapi, budget=None, mode="summarize", max_items=DEFAULT_EXAMPLE_ARRAY_ITEMS,
+                         output_dir="."):
+    """Keeps inline examples within budget bytes.
+
+       Oversized examples are either summarized (arrays truncated to max_items) or, in
+       external mode, written to output_dir/examples/ and referenced through externalValue.
+       Returns one report row per example:
+       (path, method, location, media type, original bytes, final bytes, action)."""
+    if mode not in EXAMPLE_MODES:
+        raise ValueError(f"Unknown example mode {mode!r}, expected one of {', '.join(EXAMPLE_MODES)}")
+
+    report = []
+    written = set()
+    for path, method, location, media_type, media in _iter_media_examples(openapi):
+        example = media["example"]
+        original_size = example_size(example)
+        if budget is None or original_size <= budget:
+            report.append((path, method, location, media_type, original_size, original_size, "inline"))
             continue
 
-        for file in files:
-            if file.endswith(".yml") or file.endswith(".yaml"):
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, "r") as f:
-                        data = yaml.safe_load(f)
-
-                        if "endpoints" in data:
-                            for endpoint in data["endpoints"]:
-                                endpoint_path = endpoint['path']
-                                method = endpoint["method"].lower()
-                                
-                                # Handle path parameters in the path
-                                path_with_params = endpoint_path if endpoint_path.startswith('/') else f"/{endpoint_path}"
-                                if endpoint.get("pathParams"):
-                                    # If the endpoint has path parameters, modify the path to include them
-                                    for param in endpoint.get("pathParams"):
-                                        param_name = param.get("name")
-                                        # If the external path contains this parameter in {param} format
-                                        if "{" + param_name + "}" in endpoint.get("externalPath", ""):
-                                            # Add the parameter to the path
-                                            path_with_params = f"{path_with_params}/{{{param_name}}}"
-                                
-                                # Make path unique by adding subnet ID as a prefix
-                                path = f"/{subnet_id}{path_with_params}"
-                                summary = endpoint.get("summary", f"{method.upper()} {path}")
-                                description = endpoint.get("description", "")
-                                request_body_schema = endpoint.get("requestSchema")
-
-                                # Add default values
-                                if request_body_schema:
-                                    request_body_schema = add_defaults_to_schema(request_body_schema)
-
-                                # Get content type from headers or default to application/json
-                                content_type = endpoint.get("headers", {}).get("Content-Type", "application/json")
-                                
-                                # Try to load example request and response
-                                request_example = None
-                                response_example = None
-                                
-                                # Load examples using the load_example_file function
-                                request_example = load_example_file(subnet_id, endpoint_path, "request")
-                                response_example = load_example_file(subnet_id, endpoint_path, "response")
-                                
-                                # Handle different content types appropriately
-                                if content_type == "multipart/form-data" and request_body_schema:
-                                    # For multipart/form-data, handle file uploads correctly
-                                    # Transform properties with type: file to binary format
-                                    form_schema = {
-                                        "type": "object",
-                                        "properties": {},
-                                        "required": request_body_schema.get("required", [])
-                                    }
-                                    
-                                    for prop_name, prop_details in request_body_schema.get("properties", {}).items():
-                                        if prop_details.get("type") == "file":
-                                            # For file uploads, use binary format
-                                            form_schema["properties"][prop_name] = {
-                                                "type": "string",
-                                                "format": "binary",
-                                                "description": prop_details.get("description", "")
-                                            }
-                                        else:
-                                            # For non-file properties
-                                            form_schema["properties"][prop_name] = prop_details
-                                    
-                                    request_body = {
-                                        "required": True,
-                                        "content": {
-                                            "multipart/form-data": {
-                                                "schema": form_schema
-                                            }
-                                        }
-                                    }
-                                    
-                                    # Add example if available
-                                    if request_example:
-                                        request_body["content"]["multipart/form-data"]["example"] = request_example
-                                else:
-                                    # Default case for application/json
-                                    request_body = {
-                                        "required": True,
-                                        "content": {
-                                            content_type: {
-                                                "schema": request_body_schema
-                                            }
-                                        }
-                                    } if request_body_schema else None
-                                    
-                                    # Process schema properties
-                                    if request_body and request_body_schema and "properties" in request_body_schema:
-                                        for prop_name, prop_details in request_body_schema["properties"].items():
-                                            if "exclusiveMinimum" in prop_details:
-                                                if not isinstance(prop_details["exclusiveMinimum"], bool):
-                                                    if "minimum" not in prop_details:
-                                                        prop_details["minimum"] = prop_details["exclusiveMinimum"]
-                                                    del prop_details["exclusiveMinimum"]
-                                            if "exclusiveMaximum" in prop_details:
-                                                if not isinstance(prop_details["exclusiveMaximum"], bool):
-                                                    if "maximum" not in prop_details:
-                                                        prop_details["maximum"] = prop_details["exclusiveMaximum"]
-                                                    del prop_details["exclusiveMaximum"]
-                                    
-                                    # Add example if available
-                                    if request_example and request_body:
-                                        request_body["content"][content_type]["example"] = request_example
-
-                                # Create responses object with example if available
-                                responses = {
-                                    "200": {
-                                        "description": "Successful response"
-                                    }
-                                }
-                                
-                                # Add response example if available
-                                if response_example:
-                                    responses["200"]["content"] = {
-                                        "application/json": {
-                                            "example": response_example
-                                        }
-                                    }
-
-                                # Handle query parameters for GET requests and others that use them
-                                parameters = []
-                                if endpoint.get("queryParams"):
-                                    for param in endpoint.get("queryParams"):
-                                        param_obj = {
-                                            "name": param.get("name"),
-                                            "in": "query",
-                                            "description": param.get("description", ""),
-                                            "required": param.get("required", False)
-                                        }
-                                        
-                                        # Set schema type based on param type
-                                        param_type = param.get("type", "string")
-                                        if param_type == "array":
-                                            param_obj["schema"] = {
-                                                "type": "array",
-                                                "items": {
-                                                    "type": param.get("items", {}).get("type", "string")
-                                                }
-                                            }
-                                            # Copy any additional properties from items
-                                            if "items" in param and isinstance(param["items"], dict):
-                                                param_obj["schema"]["items"].update(param["items"])
-                                        else:
-                                            param_obj["schema"] = {"type": param_type}
-                                        
-                                        # Handle enum values
-                                        if "enum" in param:
-                                            param_obj["schema"]["enum"] = param["enum"]
-                                            # Use first enum value as default only if no default specified
-                                            if "default" not in param:
-                                                param_obj["schema"]["default"] = param["enum"][0]
-                                        
-                                        # Handle min/max values
-                                        if "minimum" in param:
-                                            param_obj["schema"]["minimum"] = param["minimum"]
-                                        if "maximum" in param:
-                                            param_obj["schema"]["maximum"] = param["maximum"]
-                                        if "exclusiveMinimum" in param:
-                                            if not isinstance(param["exclusiveMinimum"], bool):
-                                                print(f"Warning: exclusiveMinimum must be a boolean value in {param}")
-                                                continue
-                                            param_obj["schema"]["exclusiveMinimum"] = param["exclusiveMinimum"]
-                                        if "exclusiveMaximum" in param:
-                                            if not isinstance(param["exclusiveMaximum"], bool):
-                                                print(f"Warning: exclusiveMaximum must be a boolean value in {param}")
-                                                continue
-                                            param_obj["schema"]["exclusiveMaximum"] = param["exclusiveMaximum"]
-                                        
-                                        # Handle default values
-                                        if "default" in param:
-                                            param_obj["schema"]["default"] = param["default"]
-                                        
-                                        parameters.append(param_obj)
-                                
-                                # Handle path parameters
-                                if endpoint.get("pathParams"):
-                                    for param in endpoint.get("pathParams"):
-                                        param_obj = {
-                                            "name": param.get("name"),
-                                            "in": "path",
-                                            "description": param.get("description", ""),
-                                            "required": param.get("required", True),
-                                            "schema": {"type": param.get("type", "string")}
-                                        }
-                                        parameters.append(param_obj)
-                                
-                                # Create the endpoint object
-                                endpoint_obj = {
-                                    "summary": summary,
-                                    "description": description,
-                                    "responses": responses,
-                                    "tags": [data.get('name', f'Subnet {subnet_id}')],  # Add subnet name as a tag
-                                    "operationId": f"{data.get('name', f'Subnet {subnet_id}')}_{endpoint_path.replace('/', '_')}"  # Add operationId for unique identification
-                                }
-                                
-                                # Add parameters if exist
-                                if parameters:
-                                    endpoint_obj["parameters"] = parameters
-                                
-                                # Add request body if exists
-                                if request_body:
-                                    endpoint_obj["requestBody"] = request_body
-                                
-                                # For GET requests with query parameters, add examples to parameters
-                                if method.lower() == "get" and endpoint.get("queryParams") and request_example:
-                                    # Update individual parameter examples
-                                    if isinstance(request_example, dict):
-                                        for param in endpoint_obj.get("parameters", []):
-                                            if param["name"] in request_example:
-                                                param["example"] = request_example[param["name"]]
-                                
-                                # Store the path with its subnet ID for sorting
-                                all_paths[(path, method, int(subnet_id))] = endpoint_obj
-                except yaml.YAMLError as e:
-                    print(f"Error reading YAML file {file_path}: {e}")
-
-    # Sort paths by subnet ID (numerically)
-    sorted_paths = sorted(all_paths.keys(), key=lambda x: x[2])  # Sort by subnet ID
-
-    # Add the sorted paths to the openapi spec
-    for path_method_id in sorted_paths:
-        path, method, _ = path_method_id
-        if path not in openapi["paths"]:
-            openapi["paths"][path] = {}
-        openapi["paths"][path][method] = all_paths[path_method_id]
+        if mode == "summarize":
+            media["example"] = truncate_example(example, max_items)
+            final_size = example_size(media["example"])
+            if final_size > budget:
+                logger.warning(f"{method.upper()} {path} {location} {media_type} example is still {final_size} bytes "
+                               f"after truncation (budget {budget})",
+                               extra={"path": path, "method": method, "location": location,
+                                      "media_type": media_type, "bytes": final_size})
+            report.append((path, method, location, media_type, original_size, final_size, "summarized"))
+            continue
+
+        safe_path = "".join(c if c.isalnum() or c in "._-/" else "_" for c in path.strip("/"))
+        relative_file = f"{EXTERNAL_EXAMPLES_DIR}/{safe_path}/{method}-{location}-{_slug(media_type)}.json"
+        # Different paths can slug to the same directory, never let one example overwrite another
+        stem, suffix = relative_file[:-len(".json")], 2
+        while relative_file in written:
+            relative_file = f"{stem}-{suffix}.json"
+            suffix += 1
+        written.add(relative_file)
+        example_file = os.path.join(output_dir, *relative_file.split("/"))
+        os.makedirs(os.path.dirname(example_file), exist_ok=True)
+        with open(example_file, "w") as f:
+            json.dump(example, f, indent=2)
+
+        del media["example"]
+        media["examples"] = {
+            "default": {
+                "summary": f"Example {location} {media_type} ({original_size} bytes)",
+                "externalValue": relative_file
+            }
+        }
+        report.append((path, method, location, media_type, original_size, 0, "external"))
+
+    return report
+
+
+def print_example_report(report):
+    """Prints the size every example contributes to the spec, largest first."""
+    print(f"{'bytes':>10} {'inline':>10}  {'action':<10}  example")
+    for path, method, location, media_type, original_size, final_size, action in sorted(report, key=lambda row: -row[4]):
+        print(f"{original_size:>10} {final_size:>10}  {action:<10}  {method.upper()} {path} {location} {media_type}")
+    print(f"{sum(row[4] for row in report):>10} {sum(row[5] for row in report):>10}  total")
+
+
+def load_fragments(api_definitions_path, subnet_ids, cache=None, jobs=1):
+    """Returns {subnet_id: path fragment} for subnet_ids. With a BuildCache, unchanged subnets are
+       loaded from it and rebuilt ones are stored back; the others are built with build_subnets()."""
+    fragments = {}
+    content_hashes = {}
+    if cache:
+        with stage("cache_lookup"):
+            for subnet_id in subnet_ids:
+                with stage("content_hash", subnet_id):
+                    content_hashes[subnet_id] = subnet_content_hash(api_definitions_path, subnet_id, cache.salt)
+                subnet_paths = cache.load(subnet_id, content_hashes[subnet_id])
+                if subnet_paths is not None:
+                    fragments[subnet_id] = subnet_paths
+                else:
+                    logger.info(f"Rebuilding subnet {subnet_id}", extra={"subnet_id": subnet_id})
+
+    stale_ids = [subnet_id for subnet_id in subnet_ids if subnet_id not in fragments]
+    with stage("build"):
+        rebuilt = build_subnets(api_definitions_path, stale_ids, jobs)
+    fragments.update(rebuilt)
+
+    if cache:
+        with stage("cache_store"):
+            for subnet_id, subnet_paths in rebuilt.items():
+                cache.store(subnet_id, content_hashes[subnet_id], subnet_paths)
+
+    return fragments
+
+
+def merge_fragments(openapi, subnet_ids, fragments):
+    """Adds the path fragments to openapi["paths"] in subnet ID order, independent of the order
+       they were built in."""
+    with stage("sorting"):
+        for subnet_id in subnet_ids:
+            subnet_paths = fragments[subnet_id]
+            for path, method, endpoint_obj in subnet_paths:
+                if path not in openapi["paths"]:
+                    openapi["paths"][path] = {}
+                openapi["paths"][path][method] = endpoint_obj
+    return openapi
+
+
+def generate_openapi(api_definitions_path, output_file, cache_dir=None, jobs=1, dedupe_schemas=False,
+                     example_budget=None, example_mode="summarize", example_array_items=DEFAULT_EXAMPLE_ARRAY_ITEMS,
+                     example_report=False):
+    """Generates an OpenAPI specification with subnet ID in paths,
+       fixed Bearer auth, ordered by subnet ID, and includes examples from examples/ directory.
+
+       When cache_dir is given, each subnet's path fragment is cached under a content hash of its
+       definition and examples, and only changed subnets are rebuilt. With jobs > 1 subnets are
+       built in a pool of worker processes; the result does not depend on jobs. With dedupe_schemas,
+       repeated subschemas are moved into components/schemas and referenced with $ref.
+
+       example_budget caps the inline size of each example in bytes, see apply_example_budget();
+       externalized examples are written next to output_file."""
+
+    openapi = create_openapi_base()
+
+    with stage("discovery"):
+        subnet_ids = discover_subnets(api_definitions_path)
+    cache = BuildCache(cache_dir) if cache_dir else None
+
+    fragments = load_fragments(api_definitions_path, subnet_ids, cache, jobs)
+    if cache:
+        with stage("cache_prune"):
+            cache.prune(subnet_ids)
+
+    merge_fragments(openapi, subnet_ids, fragments)
+
+    if dedupe_schemas:
+        with stage("schema_deduplication"):
+            deduplicate_schemas(openapi)
+
+    with stage("example_budget"):
+        report = apply_example_budget(openapi, example_budget, example_mode, example_array_items,
+                                      os.path.dirname(output_file) or ".")
+    if example_report:
+        print_example_report(report)
 
     return openapi
 
+
+COMPRESSIONS = ("gz", "br")
+
+
+def iter_spec_chunks(openapi, compact=False, memo=None):
+    """Yields the JSON text of openapi piece by piece, one path entry at a time.
+
+       The concatenated chunks are identical to json.dumps(openapi, indent=2), or to its compact
+       form (no whitespace) with compact=True, without ever holding the whole string in memory.
+
+       memo is an optional dict kept between calls (with the same compact): a path entry whose
+       operations are the very same object as last time is not encoded again."""
+    if compact:
+        item_sep, key_sep = ",", ":"
+
+        def encode(value, depth):
+            return json.dumps(value, separators=(",", ":"))
+
+        def newline(depth):
+            return ""
+    else:
+        item_sep, key_sep = ",", ": "
+
+        def encode(value, depth):
+            # json.dumps never emits a raw newline inside a string, so re-indenting is safe
+            return json.dumps(value, indent=2).replace("\n", "\n" + "  " * depth)
+
+        def newline(depth):
+            return "\n" + "  " * depth
+
+    if not openapi:
+        yield "{}"
+        return
+
+    yield "{"
+    for i, (key, value) in enumerate(openapi.items()):
+        if i:
+            yield item_sep
+        yield newline(1) + json.dumps(key) + key_sep
+        if key == "paths" and isinstance(value, dict) and value:
+            yield "{"
+            for j, (path, operations) in enumerate(value.items()):
+                if j:
+                    yield item_sep
+                if memo is None:
+                    yield newline(2) + json.dumps(path) + key_sep + encode(operations, 2)
+                    continue
+                cached = memo.get(path)
+                if cached is None or cached[0] is not operations:
+                    cached = memo[path] = (operations, newline(2) + json.dumps(path) + key_sep + encode(operations, 2))
+                yield cached[1]
+            yield newline(1) + "}"
+        else:
+            yield encode(value, 1)
+    yield newline(0) + "}"
+
+
+class SpecOutput:
+    """Writes a spec to output_file and, on the fly, to its compressed .gz / .br siblings."""
+
+    def __init__(self, output_file, compress=()):
+        self.files = [output_file]
+        self._raw = open(output_file, "wb")
+        self._gzip = None
+        self._brotli = None
+        if "gz" in compress:
+            self.files.append(f"{output_file}.gz")
+            # mtime=0 and no embedded file name keep the archive reproducible
+            self._gzip_file = open(f"{output_file}.gz", "wb")
+            self._gzip = gzip.GzipFile(filename="", mode="wb", compresslevel=9, fileobj=self._gzip_file, mtime=0)
+        if "br" in compress:
+            if brotli is None:
+                raise RuntimeError("Brotli output requires the 'brotli' package (pip install brotli)")
+            self.files.append(f"{output_file}.br")
+            self._brotli_file = open(f"{output_file}.br", "wb")
+            self._brotli = brotli.Compressor(mode=brotli.MODE_TEXT)
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self._raw.write(data)
+        if self._gzip:
+            self._gzip.write(data)
+        if self._brotli:
+            self._brotli_file.write(self._brotli.process(data))
+
+    def close(self):
+        self._raw.close()
+        if self._gzip:
+            self._gzip.close()
+            self._gzip_file.close()
+        if self._brotli:
+            self._brotli_file.write(self._brotli.finish())
+            self._brotli_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_spec(openapi, output_file, compact=False, compress=()):
+    """Streams openapi to output_file (plus compressed siblings). Returns the files written."""
+    with SpecOutput(output_file, compress) as output:
+        for chunk in iter_spec_chunks(openapi, compact):
+            output.write(chunk)
+    return output.files
+
+
+def _subnet_of_path(path):
+    return path.strip("/").split("/", 1)[0]
+
+
+def _rebase_external_values(operations, prefix):
+    """Returns operations with relative externalValue URLs prefixed, copying only what changes."""
+    if next(_iter_external_values(operations), None) is None:
+        return operations
+    operations = copy.deepcopy(operations)
+    for example in _iter_external_values(operations):
+        if "://" not in example["externalValue"] and not example["externalValue"].startswith("/"):
+            example["externalValue"] = prefix + example["externalValue"]
+    return operations
+
+
+def _iter_external_values(value):
+    if isinstance(value, dict):
+        if "externalValue" in value:
+            yield value
+        for item in value.values():
+            yield from _iter_external_values(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _iter_external_values(item)
+
+
+def write_split_spec(openapi, output_file, compact=False, compress=()):
+    """Writes one complete spec per subnet to <output stem>/<subnet id>.json and a small index
+       document to output_file listing them in Swagger UI's "urls" format. Returns the files written."""
+    output_dir = os.path.dirname(output_file) or "."
+    split_dir_name = os.path.splitext(os.path.basename(output_file))[0]
+    split_dir = os.path.join(output_dir, split_dir_name)
+    os.makedirs(split_dir, exist_ok=True)
+
+    subnet_paths = {}
+    for path, operations in openapi["paths"].items():
+        subnet_paths.setdefault(_subnet_of_path(path), {})[path] = operations
+
+    base = {key: value for key, value in openapi.items() if key != "paths"}
+    all_schemas = openapi.get("components", {}).get("schemas", {})
+
+    written = []
+    urls = []
+    for subnet_id, paths in subnet_paths.items():
+        paths = {path: _rebase_external_values(operations, "../") for path, operations in paths.items()}
+
+        # Only keep the shared schemas this subnet references, directly or through other schemas
+        needed = set()
+        pending = list(_iter_refs(paths))
+        while pending:
+            name = pending.pop().rsplit("/", 1)[-1]
+            if name in all_schemas and name not in needed:
+                needed.add(name)
+                pending.extend(_iter_refs(all_schemas[name]))
+
+        components = {key: value for key, value in openapi.get("components", {}).items() if key != "schemas"}
+        if needed:
+            components["schemas"] = {name: schema for name, schema in all_schemas.items() if name in needed}
+
+        subnet_spec = dict(base)
+        subnet_spec["paths"] = paths
+        subnet_spec["components"] = components
+        # Keep the key order of the single-file layout
+        subnet_spec = {key: subnet_spec[key] for key in list(openapi) if key in subnet_spec}
+
+        tags = next(iter(next(iter(paths.values())).values())).get("tags") or [f"Subnet {subnet_id}"]
+        written += write_spec(subnet_spec, os.path.join(split_dir, f"{subnet_id}.json"), compact, compress)
+        urls.append({"url": f"{split_dir_name}/{subnet_id}.json", "name": tags[0]})
+
+    index = {
+        "info": openapi.get("info", {}),
+        "urls": urls
+    }
+    written += write_spec(index, output_file, compact, compress)
+    return written
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate openapi.json from the subnet registry.")
+    parser.add_argument("--subnets", default="../subnets",
+                        help="Path to the subnets directory (default: ../subnets)")
+    parser.add_argument("--output", default="./openapi.json",
+                        help="Path to save the openapi.json file (default: ./openapi.json)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Directory of the incremental build cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Rebuild every subnet without reading or writing the build cache")
+    parser.add_argument("--clean", action="store_true",
+                        help="Delete the build cache before building, then repopulate it")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Number of worker processes used to build subnets; 0 uses all CPUs "
+                             "(default: 1, serial)")
+    parser.add_argument("--dedupe-schemas", action="store_true",
+                        help="Move repeated subschemas into components/schemas and reference them with $ref")
+    parser.add_argument("--example-budget", type=int, default=None, metavar="BYTES",
+                        help="Maximum size of a single inline example in bytes (default: unlimited)")
+    parser.add_argument("--example-mode", choices=EXAMPLE_MODES, default="summarize",
+                        help="How to handle examples over the budget: truncate their arrays (summarize) or "
+                             "write them to separate files referenced with externalValue (external)")
+    parser.add_argument("--example-array-items", type=int, default=DEFAULT_EXAMPLE_ARRAY_ITEMS, metavar="N",
+                        help=f"Array items kept when summarizing an example (default: {DEFAULT_EXAMPLE_ARRAY_ITEMS})")
+    parser.add_argument("--example-report", action="store_true",
+                        help="Print the size each example contributes to the spec")
+    parser.add_argument("--compact", action="store_true",
+                        help="Write compact JSON without indentation")
+    parser.add_argument("--compress", action="append", choices=COMPRESSIONS, default=[],
+                        help="Also write a pre-compressed sibling of every output file (repeatable)")
+    parser.add_argument("--split", action="store_true",
+                        help="Write one spec per subnet to <output stem>/<subnet id>.json and an index to --output")
+    parser.add_argument("--profile", metavar="TRACE_FILE",
+                        help="Record time and allocations per stage and subnet and write them as a Chrome "
+                             "trace (open in Perfetto, chrome://tracing or speedscope)")
+    parser.add_argument("--log-level", default="INFO", choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                        help="Minimum level of log records to show (default: INFO)")
+    parser.add_argument("--log-format", default="text", choices=("text", "json"),
+                        help="Log records as plain text or as one JSON object per line (default: text)")
+    parser.add_argument("--quiet", "-q", action="store_true", help="Only show errors (same as --log-level ERROR)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Serve the spec from memory over HTTP and rebuild changed subnets as files change")
+    parser.add_argument("--host", default="127.0.0.1", help="Address of the --watch server (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port of the --watch server (default: 8000)")
+    parser.add_argument("--poll-interval", type=float, default=0.25, metavar="SECONDS",
+                        help="How often --watch checks for changes (default: 0.25)")
+    parser.add_argument("--debounce", type=float, default=0.2, metavar="SECONDS",
+                        help="Quiet time --watch waits for after a change before rebuilding (default: 0.2)")
+    parser.add_argument("--force-polling", action="store_true",
+                        help="Make --watch poll file modification times instead of using inotify "
+                             "(e.g. for network file systems)")
+    args = parser.parse_args()
+    if "br" in args.compress and brotli is None:
+        parser.error("--compress br requires the 'brotli' package (pip install brotli)")
+    if args.watch and (args.split or args.compress or args.profile):
+        parser.error("--watch serves a single spec from memory and cannot be combined with "
+                     "--split, --compress or --profile")
+    return args
+
+
 if __name__ == "__main__":
-    # Configuration
-    API_DEFINITIONS_PATH = "../subnets"  # Path to the subnets directory (relative to the project root)
-    OUTPUT_FILE = "./openapi.json"  # Path to save the openapi.json file (relative to the project root)
+    args = parse_args()
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    configure_logging("ERROR" if args.quiet else args.log_level, args.log_format)
+    if args.profile:
+        enable_profiling()
+
+    if args.clean and os.path.isdir(args.cache_dir):
+        if not is_cache_dir(args.cache_dir):
+            logger.error(f"Refusing to delete {args.cache_dir}: it holds files that are not build cache entries")
+            sys.exit(1)
+        shutil.rmtree(args.cache_dir)
+
+    if args.watch:
+        from dev_server import serve
+        serve(args.subnets, args.output, args.host, args.port, args.poll_interval, args.debounce, args.force_polling,
+              cache_dir=None if args.no_cache else args.cache_dir, jobs=jobs,
+              dedupe_schemas=args.dedupe_schemas, example_budget=args.example_budget,
+              example_mode=args.example_mode, example_array_items=args.example_array_items,
+              compact=args.compact)
+        sys.exit(0)
 
     # Generate OpenAPI specification
-    openapi_spec = generate_openapi(API_DEFINITIONS_PATH, OUTPUT_FILE)
+    openapi_spec = generate_openapi(args.subnets, args.output,
+                                    cache_dir=None if args.no_cache else args.cache_dir, jobs=jobs,
+                                    dedupe_schemas=args.dedupe_schemas,
+                                    example_budget=args.example_budget, example_mode=args.example_mode,
+                                    example_array_items=args.example_array_items,
+                                    example_report=args.example_report)
+
+    # Save to a file, one path entry at a time
+    with stage("serialization"):
+        if args.split:
+            written = write_split_spec(openapi_spec, args.output, args.compact, args.compress)
+        else:
+            written = write_spec(openapi_spec, args.output, args.compact, args.compress)
+
+    logger.info(f"OpenAPI specification generated and saved to {', '.join(written)}", extra={"files": written})
 
-    # Save to a file (or print to stdout)
-    with open(OUTPUT_FILE, "w") as f:
-        json.dump(openapi_spec, f, indent=2)
+    if args.profile:
+        events = disable_profiling()
+        write_trace(events, args.profile)
+        summary = summarize_events(events)
+        slowest = sorted(summary["subnets"].items(), key=lambda item: -item[1])[:5]
+        logger.info(f"Profile trace saved to {args.profile}", extra={"file": args.profile, **summary})
+        for name, entry in sorted(summary["stages"].items(), key=lambda item: -item[1]["total_ms"]):
+            logger.info(f"  {name:<22} {entry['total_ms']:>10.1f} ms {entry['peak_bytes'] / 1024:>10.1f} KiB peak "
+                        f"{entry['net_bytes'] / 1024:>+10.1f} KiB net ({entry['calls']} calls)")
+        for subnet_id, total_ms in slowest:
+            logger.info(f"  subnet {subnet_id:<15} {total_ms:>10.1f} ms")
 
-    print(f"OpenAPI specification generated and saved to {OUTPUT_FILE}")
\ No newline at end of file
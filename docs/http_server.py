@@ -0,0 +1,71 @@
+"""Minimal asyncio HTTP/1.1 server shared by the mock upstream and the watch mode server.
+
+Handles the keep-alive connection loop, the request line and headers; subclasses implement
+handle() and answer with respond(). Request bodies are left on the reader for handle() to consume.
+"""
+import asyncio
+from collections import namedtuple
+from http import HTTPStatus
+
+MAX_HEADER_BYTES = 64 * 1024
+
+Request = namedtuple("Request", ["method", "target", "path", "version", "headers", "keep_alive"])
+
+
+async def respond(writer, status, body=b"", headers=None, keep_alive=True, head_only=False):
+    """Writes one response; the body is left out for HEAD requests (head_only) and 304 has no Content-Length."""
+    reason = HTTPStatus(status).phrase if status in HTTPStatus._value2member_map_ else "Unknown"
+    headers = dict(headers or {})
+    headers.setdefault("Content-Type", "text/plain; charset=utf-8")
+    if status != 304:
+        headers["Content-Length"] = str(len(body))
+    headers["Connection"] = "keep-alive" if keep_alive else "close"
+    head = [f"HTTP/1.1 {status} {reason}"] + [f"{key}: {value}" for key, value in headers.items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+    if not head_only:
+        writer.write(body)
+    await writer.drain()
+
+
+class HTTPServer:
+    """Base class: parses requests off each connection and passes them to handle()."""
+
+    server = None
+
+    async def handle(self, request, reader, writer):
+        """Answers one request; returns False when the connection should be closed."""
+        raise NotImplementedError
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while await self._handle_request(reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, reader, writer):
+        request_line = await reader.readline()
+        if not request_line:
+            return False
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            await respond(writer, 400, b"Malformed request line", keep_alive=False)
+            return False
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+        request = Request(method, target, target.split("?", 1)[0], version, headers, keep_alive)
+        return await self.handle(request, reader, writer)
+
+    async def start(self, host, port):
+        self.server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        return self.server
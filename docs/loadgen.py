@@ -0,0 +1,317 @@
+"""Open-loop load generator replaying the registry's request examples.
+
+Every endpoint with an examples/<endpoint>/request.json is replayed against a base URL, either
+an Oracle server (paths /<subnet id><path>, e.g. the localhost:3000 servers of the spec) or the
+local mock upstream (paths /<subnet id><externalPath>):
+
+    python loadgen.py --base-url http://localhost:3000/prod/oracle/v1 --api-key $KEY --rate 50 --duration 30
+    python loadgen.py --base-url http://localhost:8900 --target upstream --rate 200 --output run.json
+
+Requests arrive open-loop (Poisson or constant rate) independently of how fast responses come
+back, are sent over a pool of keep-alive connections and are capped at --concurrency in flight.
+Latency is measured from the scheduled arrival time, so queueing behind the concurrency limit
+shows up in the percentiles. The JSON report holds per-endpoint throughput, p50/p95/p99 latency
+and error rates so runs can be compared over time.
+
+Multipart examples use their formData fields; the "<binary file>" placeholder is replaced by
+--upload-file or by --upload-bytes of generated data.
+"""
+import ssl
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from urllib.parse import urlsplit, urlencode
+
+from generate_openapi import create_openapi_base
+from registry import compile_route, iter_endpoints
+
+BINARY_PLACEHOLDER = "<binary file>"
+DEFAULT_UPLOAD_BYTES = 1024 * 1024
+PERCENTILES = (50, 95, 99)
+
+
+def default_base_url():
+    """The first localhost server of the generated spec."""
+    servers = [server["url"] for server in create_openapi_base()["servers"]]
+    return next((url for url in servers if "localhost" in url), servers[0])
+
+
+def encode_multipart(fields, upload):
+    boundary = uuid.uuid4().hex
+    body = bytearray()
+    for name, value in fields.items():
+        body += f"--{boundary}\r\n".encode()
+        if value == BINARY_PLACEHOLDER:
+            body += (f'Content-Disposition: form-data; name="{name}"; filename="{name}.bin"\r\n'
+                     f"Content-Type: application/octet-stream\r\n\r\n").encode()
+            body += upload
+        else:
+            text = value if isinstance(value, str) else json.dumps(value)
+            body += f'Content-Disposition: form-data; name="{name}"\r\n\r\n{text}'.encode()
+        body += b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return bytes(body), f"multipart/form-data; boundary={boundary}"
+
+
+class Scenario:
+    """One replayable request: pre-encoded method, target path, headers and body."""
+    __slots__ = ("name", "method", "target", "headers", "body")
+
+    def __init__(self, name, method, target, headers, body):
+        self.name = name
+        self.method = method
+        self.target = target
+        self.headers = headers
+        self.body = body
+
+
+def build_scenarios(api_definitions_path, base_path, target="oracle", api_key=None, upload=b"", endpoints=None):
+    """Turns every endpoint with a request example into a Scenario."""
+    scenarios = []
+    for subnet_id, data, endpoint, example_index in iter_endpoints(api_definitions_path):
+        route = compile_route(subnet_id, data, endpoint)
+        if endpoints and route.path not in endpoints:
+            continue
+        example = example_index.load(subnet_id, endpoint["path"], "request")
+        if example is None:
+            continue
+
+        path = route.path if target == "oracle" else f"/{subnet_id}{route.external_path}"
+        headers = {}
+        body = b""
+        if route.method == "GET":
+            if isinstance(example, dict) and example:
+                path += "?" + urlencode(example, doseq=True)
+        elif route.content_type == "multipart/form-data":
+            fields = example.get("formData", example) if isinstance(example, dict) else {}
+            body, headers["Content-Type"] = encode_multipart(fields, upload)
+        else:
+            body = json.dumps(example).encode()
+            headers["Content-Type"] = route.content_type
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        scenarios.append(Scenario(route.path, route.method, base_path + path, headers, body))
+    return scenarios
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def request(self, host, scenario):
+        head = [f"{scenario.method} {scenario.target} HTTP/1.1", f"Host: {host}",
+                f"Content-Length: {len(scenario.body)}", "Connection: keep-alive"]
+        head += [f"{key}: {value}" for key, value in scenario.headers.items()]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + scenario.body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0].strip() or b"0", 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif "content-length" in headers:
+            await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            await self.reader.read()
+            headers["connection"] = "close"
+        reusable = headers.get("connection", "").lower() != "close"
+        return status, reusable
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool:
+    """Keep-alive connections to one origin, opened on demand and reused."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.host_header = parts.netloc
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.idle = []
+        self.opened = 0
+
+    async def request(self, scenario):
+        connection = self.idle.pop() if self.idle else None
+        if connection is None:
+            reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+            connection = Connection(reader, writer)
+            self.opened += 1
+        try:
+            status, reusable = await connection.request(self.host_header, scenario)
+        except BaseException:
+            connection.close()
+            raise
+        if reusable:
+            self.idle.append(connection)
+        else:
+            connection.close()
+        return status
+
+    def close(self):
+        for connection in self.idle:
+            connection.close()
+        self.idle = []
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list (python -m doctest loadgen.py checks it).
+
+    >>> [percentile(list(range(1, 101)), pct) for pct in (50, 95, 99)]
+    [50, 95, 99]
+    >>> percentile(list(range(1, 11)), 50), percentile([1, 2], 50), percentile([1, 2], 51), percentile([7], 0)
+    (5, 1, 2, 7)
+    """
+    if not sorted_values:
+        return None
+    # pct * n / 100 is exact when it is a whole number, pct / 100 * n is not (0.07 * 100 > 7)
+    rank = math.ceil(pct * len(sorted_values) / 100) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+def summarize(samples, elapsed):
+    """samples: [(status or None, latency seconds)] -> report dict."""
+    latencies = sorted(latency for _, latency in samples)
+    statuses = {}
+    errors = 0
+    for status, _ in samples:
+        key = str(status) if status is not None else "connection_error"
+        statuses[key] = statuses.get(key, 0) + 1
+        errors += status is None or status >= 400
+    summary = {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round(errors / len(samples), 6) if samples else 0.0,
+        "statuses": statuses,
+    }
+    for pct in PERCENTILES:
+        value = percentile(latencies, pct)
+        summary[f"p{pct}_ms"] = round(value * 1000, 3) if value is not None else None
+    summary["max_ms"] = round(latencies[-1] * 1000, 3) if latencies else None
+    return summary
+
+
+async def run_load(base_url, scenarios, rate, duration, concurrency, arrivals="poisson", timeout=30.0, seed=None):
+    """Replays scenarios open-loop at rate requests/s for duration seconds. Returns the report."""
+    rng = random.Random(seed)
+    pool = ConnectionPool(base_url)
+    limit = asyncio.Semaphore(concurrency)
+    samples = {scenario.name: [] for scenario in scenarios}
+    tasks = []
+
+    async def send(scenario, scheduled):
+        async with limit:
+            try:
+                status = await asyncio.wait_for(pool.request(scenario), timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+                status = None
+        samples[scenario.name].append((status, time.perf_counter() - scheduled))
+
+    loop_start = time.perf_counter()
+    next_arrival = 0.0
+    while next_arrival < duration:
+        delay = loop_start + next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(rng.choice(scenarios), loop_start + next_arrival)))
+        next_arrival += rng.expovariate(rate) if arrivals == "poisson" else 1 / rate
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - loop_start
+    pool.close()
+
+    all_samples = [sample for endpoint_samples in samples.values() for sample in endpoint_samples]
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - elapsed)),
+        "base_url": base_url,
+        "rate_rps": rate,
+        "arrivals": arrivals,
+        "duration_s": duration,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "connections_opened": pool.opened,
+        "total": summarize(all_samples, elapsed),
+        "endpoints": {name: summarize(endpoint_samples, elapsed) for name, endpoint_samples in samples.items()},
+    }
+
+
+def print_report(report):
+    print(f"{'endpoint':<36} {'reqs':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for name, summary in rows:
+        if not summary["requests"]:
+            continue
+        print(f"{name:<36} {summary['requests']:>7} {summary['throughput_rps']:>9.1f} "
+              f"{summary['p50_ms']:>9.1f} {summary['p95_ms']:>9.1f} {summary['p99_ms']:>9.1f} "
+              f"{summary['error_rate']:>7.1%}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay registry request examples as an open-loop load test.")
+    parser.add_argument("--subnets", default="../subnets",
+                        help="Path to the subnets directory (default: ../subnets)")
+    parser.add_argument("--base-url", default=default_base_url(),
+                        help="Server to load (default: the first localhost server of the spec)")
+    parser.add_argument("--target", choices=("oracle", "upstream"), default="oracle",
+                        help="Use Oracle paths (/<subnet id><path>) or mock upstream paths "
+                             "(/<subnet id><externalPath>)")
+    parser.add_argument("--endpoint", action="append",
+                        help="Only replay this Oracle path, e.g. /34/detect-image (repeatable)")
+    parser.add_argument("--api-key", help="Sent as 'Authorization: Bearer <key>'")
+    parser.add_argument("--rate", type=float, default=10.0, help="Arrival rate in requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to generate arrivals for")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum requests in flight")
+    parser.add_argument("--arrivals", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--upload-file", help="File sent in place of the <binary file> placeholder")
+    parser.add_argument("--upload-bytes", type=int, default=DEFAULT_UPLOAD_BYTES,
+                        help=f"Size of the generated upload when --upload-file is not given "
+                             f"(default: {DEFAULT_UPLOAD_BYTES})")
+    parser.add_argument("--seed", type=int, help="Seed for arrivals and endpoint choice")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.upload_file:
+        with open(args.upload_file, "rb") as f:
+            upload = f.read()
+    else:
+        upload = bytes(args.upload_bytes)
+
+    base_path = urlsplit(args.base_url).path.rstrip("/")
+    scenarios = build_scenarios(args.subnets, base_path, args.target, args.api_key, upload, args.endpoint)
+    if not scenarios:
+        print("No endpoint with a request example matched")
+        sys.exit(1)
+
+    report = asyncio.run(run_load(args.base_url, scenarios, args.rate, args.duration, args.concurrency,
+                                  args.arrivals, args.timeout, args.seed))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
@@ -0,0 +1,426 @@
+"""Local mock of the subnet APIs, generated from the registry.
+
+Serves every endpoint's externalPath under /<subnet id><externalPath> (and under the bare
+externalPath when no other subnet uses it) with the endpoint's examples/<endpoint>/response.json.
+Point the gateway's upstream baseUrl at http://<host>:<port>/<subnet id> to load-test it offline.
+
+Latency and errors can be injected per endpoint. multipart/form-data uploads are parsed as a
+stream: file parts are counted and discarded chunk by chunk, so a 200MB upload never holds more
+than a chunk in memory.
+
+    python mock_upstream.py --port 8900 --latency lognormal:80:0.4 --error-rate 0.01
+    python mock_upstream.py --config mock.yml
+
+The config file (YAML or JSON) sets a default behaviour and per-endpoint overrides keyed by
+mock path:
+
+    default:
+      latency: {distribution: lognormal, median_ms: 80, sigma: 0.4}
+      error_rate: 0.01
+      error_statuses: [500, 503]
+    endpoints:
+      /34/detect-video:
+        latency: uniform:500:2000
+
+Statistics (requests, bytes received, largest buffered chunk) are served at GET /__mock__/stats.
+"""
+import re
+import json
+import math
+import random
+import asyncio
+import argparse
+
+import yaml
+
+from http_server import HTTPServer, MAX_HEADER_BYTES, respond
+from registry import compile_route, iter_endpoints, PARAM_PATTERN
+
+CHUNK_SIZE = 64 * 1024
+FIELD_VALUE_LIMIT = 64 * 1024
+DEFAULT_MAX_UPLOAD_MB = 200
+# Room for multipart boundaries and part headers on top of the upload limit
+BODY_OVERHEAD_BYTES = 64 * 1024
+STATS_PATH = "/__mock__/stats"
+
+
+def parse_latency(spec):
+    """Returns a function sampling a delay in seconds from a latency spec.
+
+       spec is a number of milliseconds, a "distribution:arg:arg" string or a dict:
+       fixed:<ms>, uniform:<min ms>:<max ms>, normal:<mean ms>:<stddev ms>,
+       lognormal:<median ms>:<sigma>, exponential:<mean ms>."""
+    if spec is None:
+        return lambda: 0.0
+    if isinstance(spec, (int, float)):
+        spec = {"distribution": "fixed", "ms": spec}
+    if isinstance(spec, str):
+        name, *args = spec.split(":")
+        args = [float(arg) for arg in args]
+        keys = {"fixed": ["ms"], "uniform": ["min_ms", "max_ms"], "normal": ["mean_ms", "stddev_ms"],
+                "lognormal": ["median_ms", "sigma"], "exponential": ["mean_ms"]}
+        if name not in keys or len(args) != len(keys[name]):
+            raise ValueError(f"Invalid latency spec {spec!r}")
+        spec = dict(zip(keys[name], args), distribution=name)
+
+    distribution = spec.get("distribution", "fixed")
+    if distribution == "fixed":
+        delay = spec["ms"] / 1000
+        return lambda: delay
+    if distribution == "uniform":
+        return lambda: random.uniform(spec["min_ms"], spec["max_ms"]) / 1000
+    if distribution == "normal":
+        return lambda: max(random.gauss(spec["mean_ms"], spec["stddev_ms"]), 0) / 1000
+    if distribution == "lognormal":
+        mu = math.log(spec["median_ms"])
+        return lambda: random.lognormvariate(mu, spec["sigma"]) / 1000
+    if distribution == "exponential":
+        return lambda: random.expovariate(1 / spec["mean_ms"]) / 1000
+    raise ValueError(f"Unknown latency distribution {distribution!r}")
+
+
+class EndpointBehaviour:
+    """Injected latency and error distribution of one endpoint."""
+
+    def __init__(self, latency=None, error_rate=0.0, error_statuses=(500,)):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = float(error_rate)
+        self.error_statuses = list(error_statuses) if isinstance(error_statuses, (list, tuple)) else [error_statuses]
+
+    @classmethod
+    def from_config(cls, config, default=None):
+        merged = dict(default or {})
+        merged.update(config or {})
+        return cls(merged.get("latency"), merged.get("error_rate", 0.0), merged.get("error_statuses", [500]))
+
+    def pick_error(self):
+        if self.error_rate and random.random() < self.error_rate:
+            return random.choice(self.error_statuses)
+        return None
+
+
+class MockEndpoint:
+    __slots__ = ("subnet_id", "path", "method", "mock_path", "multipart", "response_body", "behaviour")
+
+    def __init__(self, subnet_id, path, method, mock_path, multipart, response_body):
+        self.subnet_id = subnet_id
+        self.path = path
+        self.method = method
+        self.mock_path = mock_path
+        self.multipart = multipart
+        self.response_body = response_body
+        self.behaviour = EndpointBehaviour()
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class MultipartStream:
+    """Incremental multipart/form-data parser fed with body chunks.
+
+       Only the boundary search window is buffered: file parts are counted and dropped, other
+       fields keep up to FIELD_VALUE_LIMIT bytes of their value."""
+
+    def __init__(self, boundary):
+        self.delimiter = b"\r\n--" + boundary
+        # The body starts with "--boundary" without the leading CRLF, prepend it to match uniformly
+        self.buffer = b"\r\n"
+        self.state = "preamble"
+        self.parts = []
+        self.peak_buffer = 0
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        self.peak_buffer = max(self.peak_buffer, len(self.buffer))
+        while self._step():
+            pass
+
+    def _step(self):
+        if self.state == "preamble" or self.state == "data":
+            index = self.buffer.find(self.delimiter)
+            if index < 0:
+                # Keep just enough bytes to recognise a delimiter split across chunks
+                keep = len(self.delimiter) - 1
+                if self.state == "data" and len(self.buffer) > keep:
+                    self._consume(self.buffer[:-keep])
+                self.buffer = self.buffer[-keep:]
+                return False
+            if self.state == "data":
+                self._consume(self.buffer[:index])
+            self.buffer = self.buffer[index + len(self.delimiter):]
+            self.state = "delimiter"
+            return True
+
+        if self.state == "delimiter":
+            if len(self.buffer) < 2:
+                return False
+            if self.buffer.startswith(b"--"):
+                self.state = "epilogue"
+                self.buffer = b""
+                return False
+            # Skip transport padding after the boundary
+            line_end = self.buffer.find(b"\r\n")
+            if line_end < 0:
+                return False
+            self.buffer = self.buffer[line_end + 2:]
+            self.state = "headers"
+            return True
+
+        if self.state == "headers":
+            index = self.buffer.find(b"\r\n\r\n")
+            if index < 0:
+                if len(self.buffer) > MAX_HEADER_BYTES:
+                    raise ValueError("Multipart part headers too large")
+                return False
+            self.parts.append(self._parse_part_headers(self.buffer[:index]))
+            self.buffer = self.buffer[index + 4:]
+            self.state = "data"
+            return True
+
+        # epilogue
+        self.buffer = b""
+        return False
+
+    @staticmethod
+    def _parse_part_headers(raw):
+        part = {"name": None, "filename": None, "content_type": None, "size": 0, "value": bytearray()}
+        for line in raw.decode("latin-1").split("\r\n"):
+            key, _, value = line.partition(":")
+            key = key.strip().lower()
+            if key == "content-disposition":
+                for name, quoted in re.findall(r'(\w+)="([^"]*)"', value):
+                    if name in ("name", "filename"):
+                        part[name] = quoted
+            elif key == "content-type":
+                part["content_type"] = value.strip()
+        return part
+
+    def _consume(self, data):
+        if not data:
+            return
+        part = self.parts[-1]
+        part["size"] += len(data)
+        if part["filename"] is None and len(part["value"]) < FIELD_VALUE_LIMIT:
+            part["value"] += data[:FIELD_VALUE_LIMIT - len(part["value"])]
+
+    def fields(self):
+        """Returns {name: value or {filename, content_type, size}} of the parsed parts."""
+        fields = {}
+        for part in self.parts:
+            if part["filename"] is not None:
+                fields[part["name"]] = {"filename": part["filename"], "content_type": part["content_type"],
+                                        "size": part["size"]}
+            else:
+                fields[part["name"]] = part["value"].decode("utf-8", "replace")
+        return fields
+
+
+def parse_content_length(headers):
+    """Returns the request's Content-Length (0 when absent); raises ValueError when it is not a number."""
+    value = headers.get("content-length", "0").strip() or "0"
+    if not value.isdigit():
+        raise ValueError(f"Invalid Content-Length: {value!r}")
+    return int(value)
+
+
+async def iter_body(reader, headers, content_length, max_bytes):
+    """Yields the request body in chunks of at most CHUNK_SIZE (content_length bytes, or chunked)."""
+    received = 0
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                # Skip trailers
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            remaining = size
+            while remaining:
+                chunk = await reader.read(min(remaining, CHUNK_SIZE))
+                if not chunk:
+                    raise ConnectionError("Connection closed in the middle of a chunk")
+                remaining -= len(chunk)
+                received += len(chunk)
+                if received > max_bytes:
+                    raise UploadTooLarge()
+                yield chunk
+            await reader.readexactly(2)
+    else:
+        remaining = content_length
+        if remaining > max_bytes:
+            raise UploadTooLarge()
+        while remaining:
+            chunk = await reader.read(min(remaining, CHUNK_SIZE))
+            if not chunk:
+                raise ConnectionError("Connection closed before the end of the body")
+            remaining -= len(chunk)
+            yield chunk
+
+
+class MockUpstream(HTTPServer):
+    """asyncio HTTP/1.1 server answering registry endpoints with their examples."""
+
+    def __init__(self, api_definitions_path, config=None, max_upload_bytes=DEFAULT_MAX_UPLOAD_MB * 1024 * 1024):
+        self.max_upload_bytes = max_upload_bytes
+        self.static = {}
+        self.templated = []
+        self.stats = {"requests": 0, "errors_injected": 0, "bytes_received": 0, "peak_buffer_bytes": 0,
+                      "largest_upload_bytes": 0}
+        self._load(api_definitions_path)
+        self.configure(config or {})
+
+    def _load(self, api_definitions_path):
+        endpoints = []
+        for subnet_id, data, endpoint, example_index in iter_endpoints(api_definitions_path):
+            route = compile_route(subnet_id, data, endpoint)
+            example = example_index.load(subnet_id, endpoint["path"], "response")
+            body = json.dumps(example if example is not None else {}).encode()
+            endpoints.append(MockEndpoint(subnet_id, endpoint["path"], route.method,
+                                          f"/{subnet_id}{route.external_path}",
+                                          route.content_type == "multipart/form-data", body))
+
+        external_counts = {}
+        for endpoint in endpoints:
+            external = endpoint.mock_path[len(endpoint.subnet_id) + 1:]
+            external_counts[(endpoint.method, external)] = external_counts.get((endpoint.method, external), 0) + 1
+
+        for endpoint in endpoints:
+            external = endpoint.mock_path[len(endpoint.subnet_id) + 1:]
+            mock_paths = [endpoint.mock_path]
+            if external_counts[(endpoint.method, external)] == 1:
+                mock_paths.append(external)
+            for mock_path in mock_paths:
+                if PARAM_PATTERN.search(mock_path):
+                    pattern = "^" + PARAM_PATTERN.sub("[^/]+", re.escape(mock_path).replace(r"\{", "{").replace(r"\}", "}")) + "$"
+                    self.templated.append((endpoint.method, re.compile(pattern), endpoint))
+                else:
+                    self.static[(endpoint.method, mock_path)] = endpoint
+
+    def configure(self, config):
+        """Applies a latency/error config: {"default": {...}, "endpoints": {mock path: {...}}}."""
+        default = config.get("default") or {}
+        overrides = config.get("endpoints") or {}
+        for endpoint in self.endpoints():
+            endpoint.behaviour = EndpointBehaviour.from_config(overrides.get(endpoint.mock_path), default)
+
+    def endpoints(self):
+        seen = {}
+        for endpoint in list(self.static.values()) + [endpoint for _, _, endpoint in self.templated]:
+            seen[id(endpoint)] = endpoint
+        return list(seen.values())
+
+    def resolve(self, method, path):
+        endpoint = self.static.get((method, path))
+        if endpoint is not None:
+            return endpoint
+        for route_method, pattern, endpoint in self.templated:
+            if route_method == method and pattern.match(path):
+                return endpoint
+        return None
+
+    async def handle(self, request, reader, writer):
+        method, path, headers, keep_alive = request.method, request.path, request.headers, request.keep_alive
+        self.stats["requests"] += 1
+
+        if method == "GET" and path == STATS_PATH:
+            await self._respond(writer, 200, self.stats, keep_alive)
+            return keep_alive
+
+        endpoint = self.resolve(method, path)
+        try:
+            content_length = parse_content_length(headers)
+            if headers.get("expect", "").lower() == "100-continue":
+                # Clients such as curl hold back large bodies until told to continue (or time out after ~1 s)
+                if content_length > self.max_upload_bytes + BODY_OVERHEAD_BYTES:
+                    raise UploadTooLarge()
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            fields = await self._consume_body(reader, headers, content_length, endpoint)
+        except UploadTooLarge:
+            await self._respond(writer, 413, {"error": "Upload exceeds the maximum size"}, keep_alive=False)
+            return False
+        except ValueError as e:
+            await self._respond(writer, 400, {"error": str(e)}, keep_alive=False)
+            return False
+
+        if endpoint is None:
+            await self._respond(writer, 404, {"error": f"No mock for {method} {path}"}, keep_alive)
+            return keep_alive
+
+        await asyncio.sleep(endpoint.behaviour.sample_latency())
+        status = endpoint.behaviour.pick_error()
+        if status is not None:
+            self.stats["errors_injected"] += 1
+            await self._respond(writer, status, {"error": "Injected error", "fields": fields}, keep_alive)
+        else:
+            await self._respond(writer, 200, endpoint.response_body, keep_alive)
+        return keep_alive
+
+    async def _consume_body(self, reader, headers, content_length, endpoint):
+        content_type = headers.get("content-type", "")
+        boundary = re.search(r'boundary="?([^";]+)"?', content_type)
+        multipart = content_type.startswith("multipart/form-data") and boundary
+        stream = MultipartStream(boundary.group(1).encode("latin-1")) if multipart else None
+
+        size = 0
+        async for chunk in iter_body(reader, headers, content_length, self.max_upload_bytes + BODY_OVERHEAD_BYTES):
+            size += len(chunk)
+            if stream:
+                stream.feed(chunk)
+        self.stats["bytes_received"] += size
+        self.stats["largest_upload_bytes"] = max(self.stats["largest_upload_bytes"], size)
+        if stream:
+            self.stats["peak_buffer_bytes"] = max(self.stats["peak_buffer_bytes"], stream.peak_buffer)
+            return stream.fields()
+        return None
+
+    @staticmethod
+    async def _respond(writer, status, body, keep_alive):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        await respond(writer, status, body, {"Content-Type": "application/json"}, keep_alive)
+
+    async def start(self, host="127.0.0.1", port=8900):
+        return await super().start(host, port)
+
+    async def serve_forever(self, host="127.0.0.1", port=8900):
+        server = await self.start(host, port)
+        for endpoint in sorted(self.endpoints(), key=lambda e: e.mock_path):
+            print(f"{endpoint.method:<6} http://{host}:{port}{endpoint.mock_path}")
+        async with server:
+            await server.serve_forever()
+
+
+def load_config(config_file):
+    with open(config_file, "r") as f:
+        return yaml.safe_load(f) or {}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve registry examples from a local mock upstream.")
+    parser.add_argument("--subnets", default="../subnets",
+                        help="Path to the subnets directory (default: ../subnets)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--config", help="YAML/JSON file with default and per-endpoint latency and errors")
+    parser.add_argument("--latency", help="Default latency, e.g. 50, uniform:10:100 or lognormal:80:0.4 (ms)")
+    parser.add_argument("--error-rate", type=float, help="Default fraction of requests answered with an error")
+    parser.add_argument("--max-upload-mb", type=int, default=DEFAULT_MAX_UPLOAD_MB,
+                        help=f"Reject request bodies larger than this (default: {DEFAULT_MAX_UPLOAD_MB})")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    config = load_config(args.config) if args.config else {}
+    default = config.setdefault("default", {})
+    if args.latency is not None:
+        default["latency"] = float(args.latency) if args.latency.replace(".", "", 1).isdigit() else args.latency
+    if args.error_rate is not None:
+        default["error_rate"] = args.error_rate
+
+    mock = MockUpstream(args.subnets, config, args.max_upload_mb * 1024 * 1024)
+    try:
+        asyncio.run(mock.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
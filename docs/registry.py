@@ -0,0 +1,277 @@
+"""Runtime route table for the BitMind Intelligence Oracle proxy.
+
+Loads subnets/*/api.yml once and compiles it into an immutable dispatch structure that maps
+an Oracle request (method, /<subnet id><path>) to its upstream URL, method, auth and headers:
+
+    table = RouteTable.load("../subnets", secrets={"api-key": "..."})
+    match = table.match("POST", "/34/detect-image")
+    match.upstream_url, match.route.headers
+
+Static paths are resolved with a single dict lookup and return pre-rendered URLs. Paths with
+{param} segments go through a segment trie and their upstream URL is joined from pre-split
+template parts.
+
+Run `python registry.py --benchmark` for a lookup micro-benchmark on a synthetic registry.
+"""
+import os
+import re
+import time
+import random
+import argparse
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+import yaml
+
+from generate_openapi import (
+    ExampleIndex, YamlSafeLoader, discover_subnets, list_definition_files, endpoint_route_path
+)
+
+PARAM_PATTERN = re.compile(r"\{([^{}]+)\}")
+SECRET_PATTERN = re.compile(r"\{\{([^{}]+)\}\}")
+
+# A compiled endpoint. headers and auth are read-only mappings, upstream_parts is the upstream
+# URL split into literal strings (even indices) and path parameter names (odd indices).
+Route = namedtuple("Route", [
+    "subnet_id", "path", "method", "base_url", "external_path",
+    "upstream_url", "upstream_parts", "headers", "auth", "content_type", "path_params"
+])
+
+RouteMatch = namedtuple("RouteMatch", ["route", "params", "upstream_url"])
+
+
+def load_definitions(api_definitions_path):
+    """Returns {subnet id: [parsed api definition, ...]} ordered by subnet ID."""
+    definitions = {}
+    for subnet_id in discover_subnets(api_definitions_path):
+        subnet_dir = os.path.join(api_definitions_path, subnet_id)
+        definitions[subnet_id] = []
+        for file in list_definition_files(subnet_dir):
+            with open(os.path.join(subnet_dir, file), "r") as f:
+                data = yaml.load(f, Loader=YamlSafeLoader)
+            if data:
+                definitions[subnet_id].append(data)
+    return definitions
+
+
+def iter_endpoints(api_definitions_path):
+    """Yields (subnet id, api definition, endpoint, subnet example index) for every registry endpoint."""
+    for subnet_id, subnet_definitions in load_definitions(api_definitions_path).items():
+        example_index = ExampleIndex(os.path.join(api_definitions_path, subnet_id, "examples"))
+        for data in subnet_definitions:
+            for endpoint in data.get("endpoints", []):
+                yield subnet_id, data, endpoint, example_index
+
+
+def _render_secrets(value, secrets):
+    if not secrets or not isinstance(value, str):
+        return value
+    return SECRET_PATTERN.sub(lambda m: str(secrets.get(m.group(1).strip(), m.group(0))), value)
+
+
+def compile_route(subnet_id, data, endpoint, secrets=None):
+    """Compiles a single registry endpoint into a Route."""
+    path = endpoint_route_path(subnet_id, endpoint)
+    base_url = data.get("baseUrl", "").rstrip("/")
+    external_path = endpoint.get("externalPath", endpoint["path"])
+    if not external_path.startswith("/"):
+        external_path = f"/{external_path}"
+
+    upstream_parts = tuple(PARAM_PATTERN.split(base_url + external_path))
+
+    auth = dict(endpoint.get("auth") or {})
+    headers = {key: _render_secrets(value, secrets) for key, value in (endpoint.get("headers") or {}).items()}
+    if auth.get("type") == "header" and auth.get("key"):
+        headers[auth["key"]] = _render_secrets(auth.get("value", ""), secrets)
+
+    return Route(
+        subnet_id=subnet_id,
+        path=path,
+        method=endpoint["method"].upper(),
+        base_url=base_url,
+        external_path=external_path,
+        upstream_url=upstream_parts[0] if len(upstream_parts) == 1 else None,
+        upstream_parts=upstream_parts,
+        headers=MappingProxyType(headers),
+        auth=MappingProxyType(auth),
+        content_type=headers.get("Content-Type", "application/json"),
+        path_params=tuple(PARAM_PATTERN.findall(path)),
+    )
+
+
+class _TrieNode:
+    """One path segment of the templated route trie."""
+    __slots__ = ("children", "param_child", "routes")
+
+    def __init__(self):
+        self.children = {}
+        # Parameter names may differ between routes, match() takes them from route.path_params
+        self.param_child = None
+        self.routes = {}
+
+    def insert(self, segments, route):
+        node = self
+        for segment in segments:
+            if PARAM_PATTERN.fullmatch(segment):
+                if node.param_child is None:
+                    node.param_child = _TrieNode()
+                node = node.param_child
+            else:
+                node = node.children.setdefault(segment, _TrieNode())
+        node.routes[route.method] = route
+
+    def freeze(self):
+        self.children = MappingProxyType({segment: child.freeze() for segment, child in self.children.items()})
+        if self.param_child is not None:
+            self.param_child.freeze()
+        self.routes = MappingProxyType(self.routes)
+        return self
+
+    def lookup(self, segments, index, method, values):
+        """Depth-first match preferring literal segments over parameters; values collects
+           the parameter values along the matched branch."""
+        if index == len(segments):
+            return self.routes.get(method)
+        child = self.children.get(segments[index])
+        if child is not None:
+            route = child.lookup(segments, index + 1, method, values)
+            if route is not None:
+                return route
+        if self.param_child is not None and segments[index]:
+            values.append(segments[index])
+            route = self.param_child.lookup(segments, index + 1, method, values)
+            if route is not None:
+                return route
+            values.pop()
+        return None
+
+
+class RouteTable:
+    """Immutable dispatch structure compiled from the registry."""
+
+    def __init__(self, routes):
+        static = {}
+        trie = _TrieNode()
+        for route in routes:
+            if route.path_params:
+                trie.insert(route.path.strip("/").split("/"), route)
+            else:
+                static[(route.method, route.path)] = RouteMatch(route, MappingProxyType({}), route.upstream_url)
+        self._static = MappingProxyType(static)
+        self._trie = trie.freeze()
+        self.routes = tuple(routes)
+
+    @classmethod
+    def from_definitions(cls, definitions, secrets=None):
+        routes = {}
+        for subnet_id, subnet_definitions in definitions.items():
+            for data in subnet_definitions:
+                for endpoint in data.get("endpoints", []):
+                    route = compile_route(subnet_id, data, endpoint, secrets)
+                    # A later definition of the same route replaces an earlier one, as in the spec
+                    routes[(route.method, route.path)] = route
+        return cls(list(routes.values()))
+
+    @classmethod
+    def load(cls, api_definitions_path, secrets=None):
+        return cls.from_definitions(load_definitions(api_definitions_path), secrets)
+
+    def __len__(self):
+        return len(self.routes)
+
+    def match(self, method, path):
+        """Returns the RouteMatch of an Oracle request, or None.
+
+           method must be upper case and path must not include the query string."""
+        match = self._static.get((method, path))
+        if match is not None:
+            return match
+
+        segments = path.strip("/").split("/")
+        values = []
+        route = self._trie.lookup(segments, 0, method, values)
+        if route is None:
+            return None
+        params = dict(zip(route.path_params, values))
+        parts = list(route.upstream_parts)
+        for i in range(1, len(parts), 2):
+            parts[i] = params.get(parts[i], "{" + parts[i] + "}")
+        return RouteMatch(route, params, "".join(parts))
+
+
+@lru_cache(maxsize=None)
+def get_route_table(api_definitions_path):
+    """Loads and compiles the registry at api_definitions_path once per process (without secrets)."""
+    return RouteTable.load(api_definitions_path)
+
+
+def synthetic_definitions(subnets=1000, endpoints=10, templated_ratio=0.3, seed=0):
+    """Builds an in-memory registry of subnets x endpoints; templated_ratio of the endpoints
+       take an {id} path parameter."""
+    rng = random.Random(seed)
+    definitions = {}
+    for subnet in range(1, subnets + 1):
+        endpoint_defs = []
+        for i in range(endpoints):
+            endpoint = {
+                "path": f"/endpoint-{i}",
+                "externalPath": f"/v1/endpoint-{i}",
+                "method": "POST" if i % 2 else "GET",
+                "auth": {"type": "header", "key": "Authorization", "value": "{{api-key}}"},
+                "headers": {"Content-Type": "application/json"},
+            }
+            if rng.random() < templated_ratio:
+                endpoint["externalPath"] = f"/v1/endpoint-{i}/{{id}}"
+                endpoint["pathParams"] = [{"name": "id", "type": "string"}]
+            endpoint_defs.append(endpoint)
+        definitions[str(subnet)] = [{"baseUrl": f"https://subnet-{subnet}.example.com", "endpoints": endpoint_defs}]
+    return definitions
+
+
+def run_benchmark(subnets=1000, endpoints=10, lookups=200000, seed=0):
+    """Prints compile time and lookups per second for static, templated and missing paths."""
+    definitions = synthetic_definitions(subnets, endpoints, seed=seed)
+
+    start = time.perf_counter()
+    table = RouteTable.from_definitions(definitions, secrets={"api-key": "benchmark"})
+    compile_time = time.perf_counter() - start
+    print(f"Compiled {len(table)} routes ({subnets} subnets x {endpoints} endpoints) in {compile_time * 1000:.1f} ms")
+
+    rng = random.Random(seed)
+    static = [(r.method, r.path) for r in table.routes if not r.path_params]
+    templated = [(r.method, r.path.replace("{id}", f"item-{i}")) for i, r in enumerate(table.routes) if r.path_params]
+    missing = [("GET", f"/{rng.randint(1, subnets)}/unknown-{i}") for i in range(1000)]
+
+    for label, requests in (("static", static), ("templated", templated), ("missing", missing)):
+        if not requests:
+            continue
+        sample = [rng.choice(requests) for _ in range(lookups)]
+        match = table.match
+        start = time.perf_counter()
+        for method, path in sample:
+            match(method, path)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>10}: {lookups / elapsed:>12,.0f} lookups/s ({elapsed / lookups * 1e9:.0f} ns/lookup)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compile the subnet registry into the proxy route table.")
+    parser.add_argument("--subnets", default="../subnets",
+                        help="Path to the subnets directory (default: ../subnets)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Benchmark lookups on a synthetic registry instead of listing routes")
+    parser.add_argument("--bench-subnets", type=int, default=1000)
+    parser.add_argument("--bench-endpoints", type=int, default=10)
+    parser.add_argument("--bench-lookups", type=int, default=200000)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.benchmark:
+        run_benchmark(args.bench_subnets, args.bench_endpoints, args.bench_lookups)
+    else:
+        for route in RouteTable.load(args.subnets).routes:
+            print(f"{route.method:<6} {route.path:<40} -> "
+                  f"{route.upstream_url or ''.join(route.upstream_parts)}")
@@ -1,14 +1,21 @@
 #!/bin/bash
 
-# Regenerate OpenAPI documentation using Python
-echo "Regenerating OpenAPI documentation..."
 # Try python3 first, fall back to python if not available
 if command -v python3 &>/dev/null; then
-    python3 generate_openapi.py
+    PYTHON=python3
 else
-    python generate_openapi.py
+    PYTHON=python
+fi
+
+# ./run.sh --watch [options]: serve the spec and Swagger UI from memory, rebuilding on every change
+if [ "$1" == "--watch" ]; then
+    exec $PYTHON generate_openapi.py "$@"
 fi
 
+# Regenerate OpenAPI documentation using Python
+echo "Regenerating OpenAPI documentation..."
+$PYTHON generate_openapi.py
+
 # Check if container exists and remove it
 if [ "$(docker ps -a -q -f name=subnet-io-registry-swagger)" ]; then
     echo "Removing existing container..."
@@ -0,0 +1,385 @@
+"""Precompiled request/response validators for registry endpoints.
+
+Each endpoint's requestSchema / responseSchema is normalized with add_defaults_to_schema() (the
+same normalization the spec generator applies) and compiled into a specialized Python function.
+Calling the function returns a list of error messages, empty when the instance is valid:
+
+    validate = compile_validator(endpoint["requestSchema"], multipart=True)
+    errors = validate({"video": upload, "fps": "24"})
+
+Compiled functions are cached by a structural hash of the schema. The keywords used by the
+registry (OpenAPI 3.0 flavoured JSON Schema) are supported: type (plus nullable and the
+registry's own `type: file`), enum, properties, required, additionalProperties, items,
+min/maxItems, min/maxLength, pattern, minimum/maximum with boolean exclusiveMinimum/Maximum,
+allOf, anyOf and oneOf.
+
+In multipart mode (Content-Type: multipart/form-data) form fields arrive as strings, so
+integer, number and boolean properties also accept their string forms, and `type: file`
+accepts bytes, file-like objects or a URL string.
+
+    python validators.py --check-examples   # validate every examples/*/request|response.json
+    python validators.py --benchmark        # compare against jsonschema (if installed)
+"""
+import re
+import sys
+import copy
+import json
+import time
+import hashlib
+import argparse
+
+try:
+    import jsonschema
+except ImportError:  # optional, only used by --benchmark
+    jsonschema = None
+
+from generate_openapi import add_defaults_to_schema
+from registry import iter_endpoints
+
+MULTIPART = "multipart/form-data"
+
+_MISSING = object()
+_INVALID = object()
+
+_validator_cache = {}
+
+
+def _as_int(text):
+    try:
+        return int(text)
+    except ValueError:
+        return _INVALID
+
+
+def _as_number(text):
+    try:
+        return float(text)
+    except ValueError:
+        return _INVALID
+
+
+def _as_bool(text):
+    return {"true": True, "false": False, "1": True, "0": False}.get(text.lower(), _INVALID)
+
+
+def _is_file(value):
+    return isinstance(value, (str, bytes, bytearray, memoryview)) or hasattr(value, "read")
+
+
+# Type checks as expressions of the value variable {v}
+TYPE_CHECKS = {
+    "string": "isinstance({v}, str)",
+    # Like JSON Schema Draft 4 (which OpenAPI 3.0 builds on), 1.0 is a number but not an integer
+    "integer": "(isinstance({v}, int) and not isinstance({v}, bool))",
+    "number": "(isinstance({v}, (int, float)) and not isinstance({v}, bool))",
+    "boolean": "isinstance({v}, bool)",
+    "array": "isinstance({v}, list)",
+    "object": "isinstance({v}, dict)",
+    "null": "{v} is None",
+}
+MULTIPART_COERCIONS = {"integer": "_as_int", "number": "_as_number", "boolean": "_as_bool"}
+
+
+def normalize_schema(schema):
+    """Returns a copy of schema normalized the way the spec generator does."""
+    return add_defaults_to_schema(copy.deepcopy(schema))
+
+
+def schema_hash(schema, multipart=False):
+    canonical = json.dumps(schema, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{int(multipart)}:{canonical}".encode()).hexdigest()
+
+
+class _CodeGen:
+    """Emits the body of a validator function for one schema."""
+
+    def __init__(self, multipart):
+        self.multipart = multipart
+        self.lines = []
+        self.namespace = {
+            "_MISSING": _MISSING, "_INVALID": _INVALID, "_is_file": _is_file,
+            "_as_int": _as_int, "_as_number": _as_number, "_as_bool": _as_bool,
+        }
+        self.counter = 0
+
+    def var(self, prefix):
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def const(self, value):
+        name = self.var("_k")
+        self.namespace[name] = value
+        return name
+
+    def emit(self, depth, line):
+        self.lines.append("    " * depth + line)
+
+    def error(self, depth, path, message):
+        # The path is only built when the check fails
+        self.emit(depth, f"errors.append({path} + {message!r})")
+
+    def schema(self, schema, v, path, depth, top_level_field=False):
+        if not isinstance(schema, dict):
+            return
+        if "$ref" in schema:
+            raise ValueError(f"$ref is not supported in registry schemas: {schema['$ref']}")
+
+        schema_type = schema.get("type")
+        if schema_type == "file":
+            check = f"_is_file({v})" if self.multipart else TYPE_CHECKS["string"].format(v=v)
+        elif isinstance(schema_type, str) and schema_type in TYPE_CHECKS:
+            check = TYPE_CHECKS[schema_type].format(v=v)
+        elif isinstance(schema_type, list):
+            check = "(" + " or ".join(TYPE_CHECKS[t].format(v=v) for t in schema_type if t in TYPE_CHECKS) + ")"
+        else:
+            check = None
+
+        if check and top_level_field and self.multipart and schema_type in MULTIPART_COERCIONS:
+            # Form fields are transmitted as text
+            self.emit(depth, f"if isinstance({v}, str):")
+            self.emit(depth + 1, f"{v} = {MULTIPART_COERCIONS[schema_type]}({v})")
+            check = f"({v} is not _INVALID and {check})"
+
+        if check:
+            if schema.get("nullable"):
+                self.emit(depth, f"if {v} is None:")
+                self.emit(depth + 1, "pass")
+                self.emit(depth, f"elif not {check}:")
+            else:
+                self.emit(depth, f"if not {check}:")
+            self.error(depth + 1, path, f": expected {schema_type}")
+            self.emit(depth, "else:")
+            depth += 1
+            self.emit(depth, "pass")
+
+        self.keywords(schema, v, path, depth)
+
+    def keywords(self, schema, v, path, depth):
+        if "enum" in schema:
+            self.emit(depth, f"if {v} not in {self.const(list(schema['enum']))}:")
+            self.error(depth + 1, path, f": must be one of {schema['enum']}")
+
+        if "minimum" in schema or "maximum" in schema:
+            self.emit(depth, f"if isinstance({v}, (int, float)) and not isinstance({v}, bool):")
+            if "minimum" in schema:
+                op = "<=" if schema.get("exclusiveMinimum") is True else "<"
+                self.emit(depth + 1, f"if {v} {op} {schema['minimum']!r}:")
+                self.error(depth + 2, path, f": must be {'>' if op == '<=' else '>='} {schema['minimum']}")
+            if "maximum" in schema:
+                op = ">=" if schema.get("exclusiveMaximum") is True else ">"
+                self.emit(depth + 1, f"if {v} {op} {schema['maximum']!r}:")
+                self.error(depth + 2, path, f": must be {'<' if op == '>=' else '<='} {schema['maximum']}")
+
+        if any(key in schema for key in ("minLength", "maxLength", "pattern")):
+            self.emit(depth, f"if isinstance({v}, str):")
+            if "minLength" in schema:
+                self.emit(depth + 1, f"if len({v}) < {int(schema['minLength'])}:")
+                self.error(depth + 2, path, f": shorter than {schema['minLength']} characters")
+            if "maxLength" in schema:
+                self.emit(depth + 1, f"if len({v}) > {int(schema['maxLength'])}:")
+                self.error(depth + 2, path, f": longer than {schema['maxLength']} characters")
+            if "pattern" in schema:
+                self.emit(depth + 1, f"if not {self.const(re.compile(schema['pattern']))}.search({v}):")
+                self.error(depth + 2, path, f": does not match {schema['pattern']!r}")
+
+        if any(key in schema for key in ("items", "minItems", "maxItems")):
+            self.emit(depth, f"if isinstance({v}, list):")
+            if "minItems" in schema:
+                self.emit(depth + 1, f"if len({v}) < {int(schema['minItems'])}:")
+                self.error(depth + 2, path, f": fewer than {schema['minItems']} items")
+            if "maxItems" in schema:
+                self.emit(depth + 1, f"if len({v}) > {int(schema['maxItems'])}:")
+                self.error(depth + 2, path, f": more than {schema['maxItems']} items")
+            if isinstance(schema.get("items"), dict) and self._has_checks(schema["items"]):
+                index, item = self.var("i"), self.var("item")
+                self.emit(depth + 1, f"for {index}, {item} in enumerate({v}):")
+                self.schema(schema["items"], item, f"{path} + '[' + str({index}) + ']'", depth + 2)
+
+        properties = schema.get("properties") if isinstance(schema.get("properties"), dict) else {}
+        required = schema.get("required") or []
+        additional = schema.get("additionalProperties", True)
+        if properties or required or additional is not True:
+            self.emit(depth, f"if isinstance({v}, dict):")
+            for name in required:
+                self.emit(depth + 1, f"if {name!r} not in {v}:")
+                self.error(depth + 2, path, f".{name}: is required")
+            for name, prop in properties.items():
+                if not self._has_checks(prop):
+                    continue
+                field = self.var("field")
+                self.emit(depth + 1, f"{field} = {v}.get({name!r}, _MISSING)")
+                self.emit(depth + 1, f"if {field} is not _MISSING:")
+                self.schema(prop, field, f"{path} + {'.' + name!r}", depth + 2,
+                            top_level_field=path == "'$'")
+            if additional is False:
+                key = self.var("key")
+                self.emit(depth + 1, f"for {key} in {v}:")
+                self.emit(depth + 2, f"if {key} not in {self.const(frozenset(properties))}:")
+                self.error(depth + 3, f"{path} + '.' + str({key})", ": is not allowed")
+            elif isinstance(additional, dict) and self._has_checks(additional):
+                key = self.var("key")
+                self.emit(depth + 1, f"for {key} in {v}:")
+                self.emit(depth + 2, f"if {key} not in {self.const(frozenset(properties))}:")
+                self.schema(additional, f"{v}[{key}]", f"{path} + '.' + str({key})", depth + 3)
+
+        for subschema in schema.get("allOf") or []:
+            self.schema(subschema, v, path, depth)
+        if schema.get("anyOf"):
+            validators = self.const([compile_validator(s, self.multipart, normalize=False) for s in schema["anyOf"]])
+            fn = self.var("fn")
+            self.emit(depth, f"if all({fn}({v}) for {fn} in {validators}):")
+            self.error(depth + 1, path, ": does not match any of anyOf")
+        if schema.get("oneOf"):
+            validators = self.const([compile_validator(s, self.multipart, normalize=False) for s in schema["oneOf"]])
+            fn = self.var("fn")
+            self.emit(depth, f"if sum(1 for {fn} in {validators} if not {fn}({v})) != 1:")
+            self.error(depth + 1, path, ": must match exactly one of oneOf")
+
+    @staticmethod
+    def _has_checks(schema):
+        ignored = {"description", "default", "example", "format", "title", "exclusiveMinimum", "exclusiveMaximum"}
+        return isinstance(schema, dict) and any(key not in ignored for key in schema)
+
+
+def compile_validator(schema, multipart=False, normalize=True):
+    """Compiles schema into a function returning the list of validation errors of an instance.
+
+       With normalize, the schema is first normalized like the spec generator does."""
+    if normalize:
+        schema = normalize_schema(schema)
+    key = schema_hash(schema, multipart)
+    validator = _validator_cache.get(key)
+    if validator is not None:
+        return validator
+
+    gen = _CodeGen(multipart)
+    gen.emit(0, "def validate(value):")
+    gen.emit(1, "errors = []")
+    gen.schema(schema, "value", "'$'", 1)
+    gen.emit(1, "return errors")
+    source = "\n".join(gen.lines)
+
+    exec(compile(source, f"<validator {key[:12]}>", "exec"), gen.namespace)
+    validator = gen.namespace["validate"]
+    validator.source = source
+    _validator_cache[key] = validator
+    return validator
+
+
+def endpoint_validators(endpoint):
+    """Returns (request validator, response validator) of a registry endpoint; either is None
+       when the endpoint declares no schema."""
+    multipart = (endpoint.get("headers") or {}).get("Content-Type") == MULTIPART
+    request_schema = endpoint.get("requestSchema")
+    response_schema = endpoint.get("responseSchema")
+    return (
+        compile_validator(request_schema, multipart) if request_schema else None,
+        compile_validator(response_schema) if response_schema else None,
+    )
+
+
+def request_example_payload(endpoint, example):
+    """Multipart request examples wrap their fields in formData."""
+    multipart = (endpoint.get("headers") or {}).get("Content-Type") == MULTIPART
+    if multipart and isinstance(example, dict) and "formData" in example:
+        return example["formData"]
+    return example
+
+
+def check_examples(api_definitions_path):
+    """Validates every request/response example against its endpoint's schema. Returns the
+       number of failing examples."""
+    failures = 0
+    for subnet_id, data, endpoint, example_index in iter_endpoints(api_definitions_path):
+        validators = dict(zip(("request", "response"), endpoint_validators(endpoint)))
+        for file_type, validate in validators.items():
+            example = example_index.load(subnet_id, endpoint["path"], file_type)
+            if example is None or validate is None:
+                continue
+            if file_type == "request":
+                example = request_example_payload(endpoint, example)
+            errors = validate(example)
+            for error in errors:
+                print(f"  {subnet_id}{endpoint['path']} {file_type}: {error}")
+            failures += bool(errors)
+    return failures
+
+
+def _jsonschema_compatible(schema):
+    """Rewrites the registry's `type: file` into a JSON Schema type jsonschema understands."""
+    if isinstance(schema, dict):
+        schema = {key: _jsonschema_compatible(value) for key, value in schema.items()}
+        if schema.get("type") == "file":
+            schema["type"] = "string"
+        return schema
+    if isinstance(schema, list):
+        return [_jsonschema_compatible(item) for item in schema]
+    return schema
+
+
+def run_benchmark(api_definitions_path, iterations=20000):
+    """Times compiled validators against jsonschema's Draft4Validator (the dialect OpenAPI 3.0
+       builds on) on every endpoint example, plus a 144-frame detect-video style response."""
+    cases = []
+    for subnet_id, data, endpoint, example_index in iter_endpoints(api_definitions_path):
+        for file_type in ("request", "response"):
+            example = example_index.load(subnet_id, endpoint["path"], file_type)
+            schema = endpoint.get(f"{file_type}Schema")
+            if example is None or schema is None:
+                continue
+            if file_type == "request":
+                example = request_example_payload(endpoint, example)
+            cases.append((f"{subnet_id}{endpoint['path']} {file_type}", normalize_schema(schema), example))
+
+        if endpoint.get("responseSchema", {}).get("properties", {}).get("frameResults"):
+            frames = [{"timestamp": i / 24, "isAI": i % 3 == 0, "confidence": 0.5} for i in range(144)]
+            example = {"isAI": False, "confidence": 0.1, "frameResults": frames,
+                       "similarity": 0.1, "fqdn": "sn34"}
+            cases.append((f"{subnet_id}{endpoint['path']} response (144 frames)",
+                          normalize_schema(endpoint["responseSchema"]), example))
+
+    if jsonschema is None:
+        print("jsonschema is not installed, only timing the compiled validators (pip install jsonschema)")
+
+    print(f"{'case':<52} {'compiled/s':>12} {'jsonschema/s':>13} {'speedup':>8}")
+    for name, schema, example in cases:
+        validate = compile_validator(schema, normalize=False)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            validate(example)
+        compiled_rate = iterations / (time.perf_counter() - start)
+
+        if jsonschema is None:
+            print(f"{name:<52} {compiled_rate:>12,.0f}")
+            continue
+        reference = jsonschema.Draft4Validator(_jsonschema_compatible(schema))
+        reference_iterations = max(iterations // 10, 1)
+        start = time.perf_counter()
+        for _ in range(reference_iterations):
+            reference.is_valid(example)
+        reference_rate = reference_iterations / (time.perf_counter() - start)
+        print(f"{name:<52} {compiled_rate:>12,.0f} {reference_rate:>13,.0f} {compiled_rate / reference_rate:>7.1f}x")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compile and check registry request/response validators.")
+    parser.add_argument("--subnets", default="../subnets",
+                        help="Path to the subnets directory (default: ../subnets)")
+    parser.add_argument("--check-examples", action="store_true",
+                        help="Validate every example against its endpoint schema (exit 1 on failure)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare compiled validators with jsonschema")
+    parser.add_argument("--iterations", type=int, default=20000)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.benchmark:
+        run_benchmark(args.subnets, args.iterations)
+    if args.check_examples or not args.benchmark:
+        failures = check_examples(args.subnets)
+        if failures:
+            print(f"{failures} example(s) do not match their schema")
+            sys.exit(1)
+        print("All examples match their endpoint schemas")